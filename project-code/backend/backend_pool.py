@@ -0,0 +1,219 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+import httpx
+from fastapi import HTTPException
+from ollama_client import OLLAMA_BASE_URL, OUTPUT_FORMAT, OUTPUT_FORMATS, create_http_client, format_name
+
+# ✅ Inference Hosts: comma separated, optional per-host slot limit as "url=slots"
+OLLAMA_BACKENDS = os.getenv("OLLAMA_BACKENDS", OLLAMA_BASE_URL)
+DEFAULT_BACKEND_SLOTS = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("OLLAMA_HEALTH_CHECK_INTERVAL", "15"))
+ACQUIRE_TIMEOUT = float(os.getenv("OLLAMA_ACQUIRE_TIMEOUT", "600"))
+
+
+def parse_backends(spec: str) -> list:
+    """Parse "http://a:11434=4,http://b:11434" into [(url, slots), ...]."""
+    backends = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, slots = item.rpartition("=")
+        if url and slots.isdigit():
+            backends.append((url.rstrip("/"), int(slots)))
+        else:
+            backends.append((item.rstrip("/"), DEFAULT_BACKEND_SLOTS))
+    return backends
+
+
+# ✅ **One Inference Host**
+class Endpoint:
+    """An Ollama host with its own connection pool and slot accounting."""
+
+    def __init__(self, url: str, max_concurrency: int):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.client = create_http_client(url)
+        self.outstanding = 0
+        self.healthy = True  # optimistic until the first probe says otherwise
+        self.available_models = set()
+        self.loaded_models = set()
+        self.last_probe = None
+        self.last_error = None
+        self.requests_served = 0
+        self.output_formats = list(OUTPUT_FORMATS[OUTPUT_FORMAT])
+
+    @property
+    def output_format(self):
+        """Strongest ``format`` this host has not rejected yet."""
+        return self.output_formats[0]
+
+    def downgrade_output_format(self):
+        if len(self.output_formats) > 1:
+            rejected = self.output_formats.pop(0)
+            logging.warning(
+                f"⚠️ Backend {self.url} does not support format={format_name(rejected)}, "
+                f"falling back to {format_name(self.output_format)}"
+            )
+        return self.output_format
+
+    def has_capacity(self) -> bool:
+        return self.healthy and self.outstanding < self.max_concurrency
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "max_concurrency": self.max_concurrency,
+            "loaded_models": sorted(self.loaded_models),
+            "output_format": format_name(self.output_format),
+            "requests_served": self.requests_served,
+            "last_probe": self.last_probe,
+            "last_error": self.last_error,
+        }
+
+
+# ✅ **Load Balancer Across Inference Hosts**
+class BackendPool:
+    """Route generations to the least busy healthy host that can serve the model.
+
+    Hosts are probed every HEALTH_CHECK_INTERVAL seconds (/api/tags for
+    installed models, /api/ps for resident ones). ``acquire(model)`` prefers
+    hosts with the model already loaded and only spills over to hosts that
+    merely have it installed when those are full; within a tier it picks the
+    least loaded host. When every eligible host is at its slot limit, callers
+    wait for a slot.
+    """
+
+    def __init__(self, backends: list = None):
+        backends = backends or parse_backends(OLLAMA_BACKENDS)
+        self.endpoints = [Endpoint(url, slots) for url, slots in backends]
+        self._changed = asyncio.Condition()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await asyncio.gather(*(endpoint.client.aclose() for endpoint in self.endpoints))
+
+    # ✅ Health probing
+    async def probe(self, endpoint: Endpoint):
+        try:
+            tags, ps = await asyncio.gather(endpoint.client.get("/api/tags"), endpoint.client.get("/api/ps"))
+            tags.raise_for_status()
+            ps.raise_for_status()
+            endpoint.available_models = self._model_names(tags.json())
+            endpoint.loaded_models = self._model_names(ps.json())
+            if not endpoint.healthy:
+                logging.info(f"💚 Backend {endpoint.url} is healthy again")
+            endpoint.healthy = True
+            endpoint.last_error = None
+        except (httpx.HTTPError, ValueError) as e:
+            if endpoint.healthy:
+                logging.warning(f"💔 Backend {endpoint.url} failed health check: {str(e) or type(e).__name__}")
+            endpoint.healthy = False
+            endpoint.last_error = str(e) or type(e).__name__
+        endpoint.last_probe = time.time()
+
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def probe_all(self):
+        await asyncio.gather(*(self.probe(endpoint) for endpoint in self.endpoints))
+
+    async def _health_loop(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+    @staticmethod
+    def _model_names(payload: dict) -> set:
+        names = set()
+        for entry in payload.get("models", []):
+            names.update(name for name in (entry.get("name"), entry.get("model")) if name)
+        return names
+
+    # ✅ Routing
+    def _tiers(self, model: str, exclude=()) -> list:
+        healthy = [e for e in self.endpoints if e.healthy and e.url not in exclude]
+        if not any(e.available_models for e in healthy):
+            return [healthy]  # nothing probed yet; any healthy host may serve
+
+        # ✅ Model-aware placement: resident first, then hosts that have it installed
+        loaded = [e for e in healthy if model in e.loaded_models]
+        installed = [e for e in healthy if model in e.available_models and e not in loaded]
+        return [tier for tier in (loaded, installed) if tier]
+
+    def _pick(self, model: str, exclude=()):
+        tiers = self._tiers(model, exclude) or (self._tiers(model) if exclude else [])
+        if not tiers:
+            raise HTTPException(status_code=503, detail=f"No healthy backend can serve {model}.")
+        for tier in tiers:
+            candidates = [e for e in tier if e.has_capacity()]
+            if candidates:
+                return min(candidates, key=lambda e: (e.outstanding / e.max_concurrency, e.outstanding))
+        return None
+
+    @asynccontextmanager
+    async def acquire(self, model: str, exclude=()):
+        """Reserve a slot on the best host for ``model`` for the duration of the block.
+
+        Hosts whose URL is in ``exclude`` are avoided unless no other can serve.
+        """
+        async with self._changed:
+            endpoint = None
+            deadline = time.monotonic() + ACQUIRE_TIMEOUT
+            while endpoint is None:
+                endpoint = self._pick(model, exclude)
+                if endpoint is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise HTTPException(status_code=503, detail="All AI backends are busy.")
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+            endpoint.outstanding += 1
+
+        try:
+            yield endpoint
+            endpoint.requests_served += 1
+        except (httpx.TransportError, HTTPException) as e:
+            if isinstance(e, httpx.TransportError) or getattr(e, "status_code", 0) == 502:
+                endpoint.healthy = False
+                endpoint.last_error = str(e) or type(e).__name__
+                logging.warning(f"💔 Backend {endpoint.url} marked unhealthy after request failure")
+            raise
+        finally:
+            endpoint.outstanding -= 1
+            async with self._changed:
+                self._changed.notify_all()
+
+    def has_free_slot(self, model: str, exclude=()) -> bool:
+        """True if a host outside ``exclude`` could take a request for ``model`` right now."""
+        return any(e.has_capacity() for tier in self._tiers(model, exclude) for e in tier)
+
+    def capacity(self) -> int:
+        """Total generation slots across healthy hosts (at least 1)."""
+        return max(1, sum(e.max_concurrency for e in self.endpoints if e.healthy))
+
+    def any_client(self) -> httpx.AsyncClient:
+        """Client of some healthy host, for metadata calls like /api/tags."""
+        for endpoint in self.endpoints:
+            if endpoint.healthy:
+                return endpoint.client
+        return self.endpoints[0].client
+
+    def metrics(self) -> list:
+        return [endpoint.snapshot() for endpoint in self.endpoints]
@@ -0,0 +1,62 @@
+import os
+
+# ✅ Continuation Settings
+MAX_CONTINUATIONS = int(os.getenv("GENERATION_MAX_CONTINUATIONS", "2"))
+STITCH_LOOKAHEAD = 256        # continuation chars buffered before stitching
+MIN_OVERLAP = 8               # shorter matches are treated as coincidence
+
+
+def is_truncated(parser) -> bool:
+    """True when the JSON object opened but the stream ended before it closed."""
+    return parser.started and not parser.done and not parser.error
+
+
+def strip_fence(text: str) -> str:
+    """Drop a leading ```json fence the model may open its continuation with."""
+    if text.startswith("```"):
+        newline = text.find("\n")
+        return text[newline + 1:] if newline != -1 else ""
+    return text
+
+
+def overlap(partial: str, continuation: str) -> int:
+    """Length of the longest prefix of ``continuation`` that ``partial`` ends with."""
+    for size in range(min(len(partial), len(continuation)), MIN_OVERLAP - 1, -1):
+        if partial.endswith(continuation[:size]):
+            return size
+    return 0
+
+
+# ✅ **Join a Continuation onto a Truncated Output**
+class Stitcher:
+    """Filter continuation tokens so they append cleanly to ``partial``.
+
+    Models often re-emit the last few characters (or a whole line) of the
+    truncated output before carrying on. The first STITCH_LOOKAHEAD chars are
+    buffered, the repeated overlap and any code fence are dropped, and from
+    then on tokens pass straight through.
+    """
+
+    def __init__(self, partial: str):
+        self.partial_tail = partial[-STITCH_LOOKAHEAD:]
+        self.pending = ""
+        self.resolved = False
+        self.overlap = 0
+
+    def feed(self, token: str) -> str:
+        if self.resolved:
+            return token
+        self.pending += token
+        if len(self.pending) < STITCH_LOOKAHEAD:
+            return ""
+        return self._resolve()
+
+    def close(self) -> str:
+        return "" if self.resolved else self._resolve()
+
+    def _resolve(self) -> str:
+        self.resolved = True
+        text = strip_fence(self.pending)
+        self.pending = ""
+        self.overlap = overlap(self.partial_tail, text)
+        return text[self.overlap:]
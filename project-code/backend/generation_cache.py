@@ -0,0 +1,114 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+# ✅ **Prompt Normalization**
+def normalize_prompt(prompt: str) -> str:
+    """Canonicalize a prompt so whitespace/Unicode variants share a cache key."""
+    prompt = unicodedata.normalize("NFC", prompt)
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+# ✅ **Cache Key**
+def make_cache_key(model: str, digest: str, options: dict, prompt: str) -> str:
+    """Content address for one generation: model, weights, options and prompt."""
+    prompt_hash = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    material = json.dumps(
+        {"model": model, "digest": digest, "options": options or {}, "prompt": prompt_hash},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# ✅ **Cache Namespace (the key minus the prompt)**
+def make_cache_namespace(model: str, digest: str, options: dict, template: str = "") -> str:
+    """Identify which model, weights, options and prompt template produced an entry.
+
+    Results from different namespaces must never be served for one another,
+    however similar their stories are.
+    """
+    material = json.dumps(
+        {"model": model, "digest": digest, "options": options or {}, "template": template},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# ✅ **Two-Tier Generation Cache**
+class GenerationCache:
+    """Bounded in-memory LRU in front of a persistent on-disk store.
+
+    Entries are the ``files`` dicts returned by the model. Disk entries live at
+    ``<cache_dir>/<key[:2]>/<key>.json`` and are written atomically, so they
+    survive restarts and concurrent readers never see partial files.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 256):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, files: dict):
+        with self._lock:
+            self.memory[key] = files
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+    def get(self, key: str):
+        """Return cached files for ``key`` or None. Blocking on disk misses."""
+        with self._lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                files = json.load(f)["files"]
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"⚠️ Ignoring unreadable cache entry {key}: {str(e)}")
+            self.misses += 1
+            return None
+
+        self._remember(key, files)
+        self.hits += 1
+        return files
+
+    def put(self, key: str, files: dict):
+        """Store ``files`` in both tiers. Blocking on the disk write."""
+        self._remember(key, files)
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"files": files}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"⚠️ Could not persist cache entry {key}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stats(self) -> dict:
+        return {"entries_in_memory": len(self.memory), "hits": self.hits, "misses": self.misses}
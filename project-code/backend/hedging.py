@@ -0,0 +1,190 @@
+import os
+import random
+import asyncio
+import logging
+from collections import deque
+from fastapi import HTTPException
+
+# ✅ Hedging / Retry Settings
+HEDGING_ENABLED = os.getenv("OLLAMA_HEDGING", "1") == "1"
+HEDGE_PERCENTILE = float(os.getenv("OLLAMA_HEDGE_PERCENTILE", "95"))
+LATENCY_WINDOW = 200          # recent generations kept per prompt kind
+LATENCY_MIN_SAMPLES = 10      # no adaptive deadlines until this many samples
+MIN_TTFT_DEADLINE = 1.0       # never hedge sooner than this (seconds)
+GENERATION_DEADLINE_MULTIPLIER = float(os.getenv("OLLAMA_DEADLINE_MULTIPLIER", "2.0"))
+MAX_GENERATION_SECONDS = float(os.getenv("OLLAMA_MAX_GENERATION_SECONDS", "900"))
+MIN_GENERATION_SECONDS = 30.0
+MAX_ATTEMPTS = int(os.getenv("OLLAMA_MAX_ATTEMPTS", "3"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 10.0
+
+# ✅ Failures that happened before the backend could have done useful work
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
+class GenerationDeadlineExceeded(HTTPException):
+    """The stream ran past its adaptive deadline (stalled or looping)."""
+
+    def __init__(self, deadline: float):
+        super().__init__(status_code=504, detail=f"AI generation exceeded its {deadline:.0f}s deadline.")
+
+
+def is_retryable(error: Exception) -> bool:
+    if not isinstance(error, HTTPException):
+        return False
+    return error.status_code in RETRYABLE_STATUS_CODES or getattr(error, "retryable", False)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry number ``attempt`` (0-based)."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# ✅ **Observed Latency Distribution**
+class LatencyTracker:
+    """Rolling time-to-first-token, throughput and duration of recent generations."""
+
+    def __init__(self):
+        self.ttft = deque(maxlen=LATENCY_WINDOW)
+        self.tokens_per_sec = deque(maxlen=LATENCY_WINDOW)
+        self.duration = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, stats: dict):
+        if stats.get("time_to_first_token") is None or not stats.get("duration"):
+            return
+        self.ttft.append(stats["time_to_first_token"])
+        self.duration.append(stats["duration"])
+        generating_for = stats["duration"] - stats["time_to_first_token"]
+        if generating_for > 0 and stats.get("token_count"):
+            self.tokens_per_sec.append(stats["token_count"] / generating_for)
+
+    def ttft_deadline(self):
+        """Seconds to wait for a first token before hedging, or None if unknown."""
+        if len(self.ttft) < LATENCY_MIN_SAMPLES:
+            return None
+        return max(MIN_TTFT_DEADLINE, _percentile(self.ttft, HEDGE_PERCENTILE))
+
+    def generation_deadline(self, num_predict: int) -> float:
+        """Upper bound on a generation of up to ``num_predict`` tokens before it is treated as stuck.
+
+        Slow-end TTFT plus ``num_predict`` tokens at slow-end throughput,
+        times GENERATION_DEADLINE_MULTIPLIER; measured from the moment a
+        backend slot is held, like the samples themselves.
+        """
+        if len(self.ttft) < LATENCY_MIN_SAMPLES or not self.tokens_per_sec or not num_predict or num_predict < 0:
+            return MAX_GENERATION_SECONDS
+        ttft = _percentile(self.ttft, HEDGE_PERCENTILE)
+        tokens_per_sec = _percentile(self.tokens_per_sec, 100 - HEDGE_PERCENTILE)
+        deadline = (ttft + num_predict / tokens_per_sec) * GENERATION_DEADLINE_MULTIPLIER
+        return min(MAX_GENERATION_SECONDS, max(MIN_GENERATION_SECONDS, deadline))
+
+    def metrics(self) -> dict:
+        def summary(values):
+            if not values:
+                return None
+            return {"p50": _percentile(values, 50), "p95": _percentile(values, 95), "samples": len(values)}
+
+        return {
+            "time_to_first_token": summary(self.ttft),
+            "tokens_per_sec": summary(self.tokens_per_sec),
+            "duration": summary(self.duration),
+            "ttft_deadline": self.ttft_deadline(),
+            "generation_deadline_1000_tokens": self.generation_deadline(1000),
+        }
+
+
+# ✅ **A Token Stream That Has Already Produced Its First Token**
+class OpenedStream:
+    """Token stream plus the resources (backend slot, HTTP response) it holds.
+
+    Use it as an async context manager while consuming, so errors reach the
+    backend pool; ``aclose()`` releases everything without consuming.
+    """
+
+    def __init__(self, stack, backend: str, first_token, tokens, stats: dict):
+        self.stack = stack
+        self.backend = backend
+        self.first_token = first_token
+        self.tokens = tokens
+        self.stats = stats
+
+    async def __aiter__(self):
+        if self.first_token is not None:
+            yield self.first_token
+        async for token in self.tokens:
+            yield token
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self.stack.__aexit__(*exc_info)
+
+    async def aclose(self):
+        await self.stack.aclose()
+
+
+# ✅ **Hedged Start: first stream to produce a token wins**
+async def hedged_open(open_stream, hedge_after, can_hedge=None, on_acquired=None):
+    """Open a stream, hedging on another backend if it is slow to start.
+
+    ``open_stream(exclude, claim)`` must return an opened stream (anything
+    with an async ``aclose()``) once its first token has arrived, avoiding
+    backends in ``exclude``, recording the backend it picked in
+    ``claim["backend"]`` and setting ``claim["acquired"]`` once it holds a
+    slot there. The hedge clock starts at that point, after ``on_acquired()``
+    is called: time queued for a slot is load, not a slow backend. If the
+    primary has produced nothing within ``hedge_after`` seconds and
+    ``can_hedge(exclude)`` allows it (a slot is free elsewhere), a duplicate
+    is started; the first to produce a token wins and the other is cancelled
+    and closed.
+    """
+    primary_claim = {"acquired": asyncio.Event()}
+    tasks = [asyncio.create_task(open_stream(set(), primary_claim))]
+    winner = None
+    try:
+        acquired = asyncio.create_task(primary_claim["acquired"].wait())
+        try:
+            await asyncio.wait([tasks[0], acquired], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            acquired.cancel()
+        if on_acquired:
+            on_acquired()
+
+        if HEDGING_ENABLED and hedge_after is not None and not tasks[0].done():
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                exclude = {primary_claim["backend"]} if "backend" in primary_claim else set()
+                if can_hedge is None or can_hedge(exclude):
+                    logging.warning(f"⏱️ No first token after {hedge_after:.1f}s, sending hedged request")
+                    tasks.append(asyncio.create_task(open_stream(exclude, {})))
+                else:
+                    # ✅ A saturated pool would only queue the duplicate and add load
+                    logging.info(f"⏱️ No first token after {hedge_after:.1f}s, but no free slot to hedge on")
+
+        error = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    winner = task.result()
+                    if len(tasks) > 1:
+                        logging.info(f"🏆 {'Primary' if task is tasks[0] else 'Hedged'} request won the race")
+                    return winner
+                error = task.exception()
+        raise error
+    finally:
+        # ✅ Cancel and close every stream except the winner
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if result is not winner and not isinstance(result, BaseException):
+                await result.aclose()
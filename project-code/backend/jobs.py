@@ -0,0 +1,186 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+import threading
+
+# ✅ Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when a submission would exceed the queue bound."""
+
+
+# ✅ **SQLite Job Store**
+class JobStore:
+    """Durable record of every job, so queued work survives a restart.
+
+    All methods are blocking; call them through ``asyncio.to_thread``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    request TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    state TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    files TEXT,
+                    error TEXT
+                )"""
+            )
+
+    def create(self, request: dict, priority: int = 0) -> dict:
+        job = {
+            "id": uuid.uuid4().hex,
+            "request": request,
+            "priority": priority,
+            "state": QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "files": None,
+            "error": None,
+        }
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (id, request, priority, state, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job["id"], json.dumps(request), priority, QUEUED, job["created_at"]),
+            )
+        return job
+
+    def update(self, job_id: str, **fields):
+        if "files" in fields and fields["files"] is not None:
+            fields["files"] = json.dumps(fields["files"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def unfinished(self) -> list:
+        """Jobs that were queued or running when the process last stopped."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM jobs WHERE state IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _row_to_job(row) -> dict:
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        job["files"] = json.loads(job["files"]) if job["files"] else None
+        return job
+
+
+# ✅ **Bounded Priority Job Queue**
+class JobQueue:
+    """Priority queue of job ids drained by a fixed pool of async workers.
+
+    Higher ``priority`` runs first; equal priorities run in submission order.
+    ``handler(job)`` performs the work and returns the list of produced files.
+    """
+
+    def __init__(self, store: JobStore, handler, workers: int = 2, max_queued: int = 100):
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.max_queued = max_queued
+        self.queue = asyncio.PriorityQueue()
+        self.running = {}
+        self._seq = 0
+        self._tasks = []
+
+    async def start(self):
+        # ✅ Recover work interrupted by a restart
+        recovered = await asyncio.to_thread(self.store.unfinished)
+        for job in recovered:
+            if job["state"] == RUNNING:
+                await asyncio.to_thread(self.store.update, job["id"], state=QUEUED, started_at=None)
+            self._enqueue(job["id"], job["priority"])
+        if recovered:
+            logging.info(f"♻️ Re-queued {len(recovered)} unfinished jobs")
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, request: dict, priority: int = 0) -> dict:
+        """Persist and enqueue a job; raise QueueFullError when at capacity."""
+        if self.queue.qsize() >= self.max_queued:
+            raise QueueFullError(f"Job queue is full ({self.max_queued} queued).")
+        job = await asyncio.to_thread(self.store.create, request, priority)
+        self._enqueue(job["id"], priority)
+        logging.info(f"📥 Job {job['id']} queued (priority={priority}, depth={self.queue.qsize()})")
+        return job
+
+    def _enqueue(self, job_id: str, priority: int):
+        self._seq += 1
+        self.queue.put_nowait((-priority, self._seq, job_id))
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self.queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["state"] not in (QUEUED, RUNNING):
+            return
+
+        started_at = time.time()
+        await asyncio.to_thread(self.store.update, job_id, state=RUNNING, started_at=started_at)
+        job.update(state=RUNNING, started_at=started_at)
+        self.running[job_id] = job
+        logging.info(f"⚙️ Job {job_id} started")
+
+        try:
+            files = await self.handler(job)
+        except asyncio.CancelledError:
+            # ✅ Shutdown: leave the job RUNNING so it is re-queued on restart
+            raise
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            logging.error(f"❌ Job {job_id} failed: {detail}")
+            await asyncio.to_thread(
+                self.store.update, job_id, state=FAILED, finished_at=time.time(), error=detail
+            )
+        else:
+            logging.info(f"✅ Job {job_id} succeeded ({len(files)} files)")
+            await asyncio.to_thread(
+                self.store.update, job_id, state=SUCCEEDED, finished_at=time.time(), files=files
+            )
+        finally:
+            self.running.pop(job_id, None)
+
+    def depth(self) -> int:
+        return self.queue.qsize()
@@ -0,0 +1,135 @@
+import re
+
+# ✅ Patterns for text (str) and for bytes-like input (bytes, bytearray, memoryview)
+_STR_PATTERNS = {
+    "structural": re.compile(r'[{}"]'),
+    "string_rest": re.compile(r'[^"\\]*+(?:\\.[^"\\]*+)*+"', re.DOTALL),
+    "colon": re.compile(r"\s*:"),
+    "files_object": re.compile(r'\{\s*"files"\s*:'),
+    "open": re.compile(r"\{"),
+    "quote": '"',
+    "open_brace": "{",
+    "key": "files",
+}
+_BYTES_PATTERNS = {
+    "structural": re.compile(rb'[{}"]'),
+    "string_rest": re.compile(rb'[^"\\]*+(?:\\.[^"\\]*+)*+"', re.DOTALL),
+    "colon": re.compile(rb"\s*:"),
+    "files_object": re.compile(rb'\{\s*"files"\s*:'),
+    "open": re.compile(rb"\{"),
+    "quote": b'"',
+    "open_brace": b"{",
+    "key": b"files",
+}
+
+
+def _patterns(data) -> dict:
+    return _STR_PATTERNS if isinstance(data, str) else _BYTES_PATTERNS
+
+
+def _string_end(data, pos: int, patterns: dict):
+    """Index just past the quote closing the string whose content starts at ``pos``.
+
+    One possessive regex match consumes the whole string, escapes included,
+    without backtracking.
+    """
+    match = patterns["string_rest"].match(data, pos)
+    return match.end() if match else None
+
+
+def _scan(data, start: int, patterns: dict):
+    """Scan the object opening at ``start``; return ``(end, has_files_key)``.
+
+    ``end`` is the index just past the matching ``}``, or None if the input
+    ends first. Only braces and quotes are visited; the regex engine skips
+    everything in between, so the scan is a single linear pass.
+    """
+    structural = patterns["structural"]
+    quote, open_brace, key = patterns["quote"], patterns["open_brace"], patterns["key"]
+    depth = 0
+    has_files = False
+    pos = start
+    while True:
+        match = structural.search(data, pos)
+        if match is None:
+            return None, has_files
+        token = match.group()
+        if token == quote:
+            end = _string_end(data, match.end(), patterns)
+            if end is None:
+                return None, has_files
+            # ✅ A top-level "files" key (not a "files" string value)
+            if (
+                depth == 1
+                and end - match.end() - 1 == len(key)
+                and data[match.end():end - 1] == key
+                and patterns["colon"].match(data, end)
+            ):
+                has_files = True
+            pos = end
+        elif token == open_brace:
+            depth += 1
+            pos = match.end()
+        else:
+            depth -= 1
+            pos = match.end()
+            if depth == 0:
+                return pos, has_files
+
+
+# ✅ **Locate the {"files": ...} Object in Model Output**
+def find_files_object(data):
+    """Return ``(start, end)`` of the first top-level object with a "files" key.
+
+    ``data`` may be ``str``, ``bytes``, ``bytearray`` or ``memoryview``; it is
+    never copied or rewritten, so code fences and backticks inside file
+    contents are left alone. Braces and quotes inside JSON strings are
+    ignored, and scanning stops at the end of the object, so trailing prose
+    costs nothing. ``end`` is None when the object is never closed (a
+    truncated response); None is returned when there is no object at all.
+    """
+    patterns = _patterns(data)
+
+    # ✅ Fast path: the first object in the input opens with the "files" key
+    first_open = patterns["open"].search(data)
+    if first_open and patterns["files_object"].match(data, first_open.start()):
+        end, _ = _scan(data, first_open.start(), patterns)
+        return first_open.start(), end
+
+    # ✅ General case: skip whole objects until one has a "files" key
+    first = None
+    pos = 0
+    while True:
+        match = patterns["open"].search(data, pos)
+        if match is None:
+            return first
+        start = match.start()
+        end, has_files = _scan(data, start, patterns)
+        if has_files or end is None:
+            return start, end
+        if first is None:
+            first = (start, end)
+        pos = end
+
+
+if __name__ == "__main__":
+    # ✅ Benchmark: multi-megabyte payloads with junk on either side
+    import json
+    import time
+
+    files = {f"src/components/C{i}.js": "const x = {a: `${1}`};\n// \"quoted\" }{ \\n\n" * 400 for i in range(300)}
+    payload = json.dumps({"files": files})
+    junk = "Here is the code you asked for {maybe}.\n```json\n" * 20000
+
+    for label, text in (
+        ("payload only", payload),
+        ("junk before", junk + payload),
+        ("junk after", payload + "\n```\n" + junk),
+        ("junk both sides", junk + payload + junk),
+    ):
+        for kind, data in (("str", text), ("memoryview", memoryview(text.encode("utf-8")))):
+            started = time.perf_counter()
+            start, end = find_files_object(data)
+            elapsed = time.perf_counter() - started
+            assert json.loads(bytes(data[start:end]) if kind == "memoryview" else data[start:end]) == {"files": files}
+            print(f"{label:16} {kind:10} {len(data) / 1e6:6.1f} MB  {elapsed * 1000:8.1f} ms")
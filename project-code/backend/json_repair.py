@@ -0,0 +1,274 @@
+import re
+import json
+from fastapi import HTTPException
+
+# ✅ Characters that need attention outside / inside strings
+_STRUCTURAL = re.compile(r"""["'{}\[\],:]""")
+_DOUBLE_QUOTED_REST = re.compile(r'[^"\\]*+(?:\\.[^"\\]*+)*+"', re.DOTALL)
+_CONTROL = re.compile(r"[\x00-\x1f]")
+# An escaped backslash, or a lone backslash that does not start a JSON escape. Both
+# are replaced by two backslashes: the first is unchanged, the second is escaped.
+_BACKSLASHES = re.compile(r'\\\\|\\(?=[^"\\/bfnrtu]|u(?![0-9a-fA-F]{4}))', re.DOTALL)
+_IN_SINGLE_QUOTED = re.compile(r"""['"\\\x00-\x1f]""")
+_TRAILING_COMMA = re.compile(r"\s*[}\]]")
+_FILES_OPEN = re.compile(r'"files"\s*:\s*\{')
+_ENTRY_KEY = re.compile(r'[\s,]*"((?:[^"\\\n]|\\.)*)"\s*:\s*')
+_ENTRY_END = re.compile(r"\s*[,}]")
+# Where the next entry probably starts after a broken one: a quoted, path-like key
+_NEXT_PATH_KEY = re.compile(r',\s*"[\w@./ -]+\.[A-Za-z0-9]+"\s*:')
+_HEX4 = re.compile(r"[0-9a-fA-F]{4}")
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+_CONTROL_TABLE = {code: _CONTROL_ESCAPES.get(chr(code), f"\\u{code:04x}") for code in range(32)}
+_VALID_ESCAPES = set('"\\/bfnrt')
+
+
+class InvalidModelJSON(HTTPException):
+    """Model output that is not JSON even after repair; worth regenerating."""
+
+    retryable = True
+    reason = "invalid_json"
+
+    def __init__(self):
+        super().__init__(status_code=500, detail="Invalid JSON from AI.")
+
+
+class _Frame:
+    __slots__ = ("kind", "state", "cut")
+
+    def __init__(self, kind: str, cut: int):
+        self.kind = kind                      # "{" or "["
+        self.state = "key" if kind == "{" else "value"
+        self.cut = cut                        # len(out) where the current member starts
+
+
+def _note(fixes: list, fix: str):
+    if fix not in fixes:
+        fixes.append(fix)
+
+
+def _value_done(stack):
+    if stack:
+        stack[-1].state = "after_value"
+
+
+def _fix_string_content(content: str, fixes: list) -> str:
+    """Escape raw control characters and stray backslashes in a string body."""
+    if _CONTROL.search(content):
+        content = content.replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
+        content = _CONTROL.sub(lambda m: _CONTROL_TABLE[ord(m.group())], content)
+        _note(fixes, "control_chars")
+    if "\\" in content:
+        # ✅ "\d" in a regex, "\$" in a template literal: keep the backslash itself
+        fixed = _BACKSLASHES.sub(r"\\\\", content)
+        if fixed != content:
+            content = fixed
+            _note(fixes, "invalid_escapes")
+    return content
+
+
+def _read_string(text: str, start: int, out: list, fixes: list):
+    """Copy the string opening at ``start`` to ``out`` as valid JSON.
+
+    Returns the index after its closing quote, or None if the text ends
+    inside the string.
+    """
+    if text[start] == '"':
+        # ✅ Common case: find the end with one regex match, fix the content in bulk
+        match = _DOUBLE_QUOTED_REST.match(text, start + 1)
+        if match is None:
+            return None
+        content = _fix_string_content(text[start + 1:match.end() - 1], fixes)
+        out.append(f'"{content}"')
+        return match.end()
+
+    # ✅ Single-quoted string: walk it, re-escaping for double quotes
+    _note(fixes, "single_quotes")
+    out.append('"')
+    pos = start + 1
+    while True:
+        match = _IN_SINGLE_QUOTED.search(text, pos)
+        if match is None:
+            return None
+        index = match.start()
+        out.append(text[pos:index])
+        char = text[index]
+        if char == "'":
+            out.append('"')
+            return index + 1
+        if char == "\\":
+            escaped = text[index + 1:index + 2]
+            if not escaped:
+                return None
+            if escaped in _VALID_ESCAPES:
+                out.append(text[index:index + 2])
+                pos = index + 2
+            elif escaped == "u" and _HEX4.match(text, index + 2):
+                out.append(text[index:index + 6])
+                pos = index + 6
+            elif escaped == "'":
+                out.append("'")
+                pos = index + 2
+            else:
+                # ✅ "\d" in a regex, "\$" in a template literal: keep the backslash
+                out.append("\\\\")
+                pos = index + 1
+                _note(fixes, "invalid_escapes")
+        elif char == '"':
+            out.append('\\"')
+            pos = index + 1
+        else:
+            out.append(_CONTROL_TABLE[ord(char)])
+            pos = index + 1
+            _note(fixes, "control_chars")
+
+
+# ✅ **Repair Near-Valid JSON**
+def repair_json(text: str) -> tuple:
+    """Rewrite ``text`` as JSON, fixing common model defects in a single pass.
+
+    The fixes are a fixed, deterministic set:
+
+    - ``single_quotes``: 'strings' and 'keys' become double-quoted
+    - ``control_chars``: raw newlines/tabs inside strings are escaped
+    - ``invalid_escapes``: backslashes before non-JSON escapes are doubled
+    - ``trailing_comma``: commas before ``}`` or ``]`` are dropped
+    - ``truncated_entry``: a member cut off by the end of the text is dropped
+    - ``missing_closers``: unclosed objects and arrays are closed
+
+    Returns ``(repaired_text, fixes_applied)``.
+    """
+    out = []
+    fixes = []
+    stack = []
+    pos = 0
+    truncated = False
+
+    while True:
+        match = _STRUCTURAL.search(text, pos)
+        between = text[pos:match.start() if match else len(text)]
+        out.append(between)
+        if between.strip():
+            _value_done(stack)  # number, true, false or null
+        if match is None:
+            break
+
+        index = match.start()
+        char = text[index]
+        pos = index + 1
+        if char in "\"'":
+            is_key = bool(stack) and stack[-1].kind == "{" and stack[-1].state == "key"
+            end = _read_string(text, index, out, fixes)
+            if end is None:
+                truncated = True
+                break
+            pos = end
+            if is_key:
+                stack[-1].state = "colon"
+            else:
+                _value_done(stack)
+        elif char in "{[":
+            out.append(char)
+            stack.append(_Frame(char, len(out)))
+        elif char in "}]":
+            out.append(char)
+            if stack:
+                stack.pop()
+                _value_done(stack)
+            if not stack:
+                break  # the top-level value is complete
+        elif char == ",":
+            if _TRAILING_COMMA.match(text, pos):
+                _note(fixes, "trailing_comma")
+                continue
+            if stack:
+                stack[-1].cut = len(out)
+                stack[-1].state = "key" if stack[-1].kind == "{" else "value"
+            out.append(",")
+        else:  # ":"
+            out.append(":")
+            if stack:
+                stack[-1].state = "value"
+
+    # ✅ End of text inside a value: drop the incomplete member, then close everything
+    if stack:
+        frame = stack[-1]
+        if truncated or frame.state != "after_value":
+            dropped = "".join(out[frame.cut:]).strip()
+            del out[frame.cut:]
+            if dropped == ",":
+                _note(fixes, "trailing_comma")
+            elif dropped:
+                _note(fixes, "truncated_entry")
+        _note(fixes, "missing_closers")
+        for frame in reversed(stack):
+            out.append("}" if frame.kind == "{" else "]")
+
+    return "".join(out), fixes
+
+
+def loads_tolerant(text: str) -> tuple:
+    """``json.loads`` that falls back to ``repair_json``; returns ``(value, fixes)``.
+
+    Raises InvalidModelJSON when even the repaired text does not parse.
+    """
+    try:
+        return json.loads(text), []
+    except json.JSONDecodeError:
+        pass
+
+    repaired, fixes = repair_json(text)
+    try:
+        return json.loads(repaired), fixes
+    except json.JSONDecodeError:
+        raise InvalidModelJSON()
+
+
+def _decode_string(content: str):
+    """Decode a JSON string body, repairing it if needed; None if hopeless."""
+    for attempt in (content, _fix_string_content(content, [])):
+        try:
+            return json.loads(f'"{attempt}"')
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+# ✅ **Salvage the Valid Entries of a Broken "files" Object**
+def salvage_files(text: str) -> tuple:
+    """Parse the "files" object entry by entry; return ``(files, broken_paths)``.
+
+    Used when the document as a whole cannot be repaired. Each value is
+    decoded on its own; one that is not a valid string (an unescaped quote,
+    a truncated body, a nested object) marks its path as broken, and parsing
+    resumes at the next path-like key.
+    """
+    files = {}
+    broken = []
+    opening = _FILES_OPEN.search(text)
+    if opening is None:
+        return files, broken
+
+    pos = opening.end()
+    while True:
+        key_match = _ENTRY_KEY.match(text, pos)
+        if key_match is None:
+            break
+        path = _decode_string(key_match.group(1)) or key_match.group(1)
+        pos = key_match.end()
+
+        if text.startswith('"', pos):
+            value_match = _DOUBLE_QUOTED_REST.match(text, pos + 1)
+            if value_match and _ENTRY_END.match(text, value_match.end()):
+                content = _decode_string(text[pos + 1:value_match.end() - 1])
+                if content is not None:
+                    files[path] = content
+                    pos = value_match.end()
+                    continue
+
+        broken.append(path)
+        resync = _NEXT_PATH_KEY.search(text, pos)
+        if resync is None:
+            break
+        pos = resync.start()
+
+    return files, broken
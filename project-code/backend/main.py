@@ -1,12 +1,49 @@
 import os
+import re
+import asyncio
 import logging
 import json
-import subprocess
-import requests
-import re
+import time
+import hashlib
+from contextlib import AsyncExitStack, asynccontextmanager
 from datetime import datetime
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from backend_pool import BackendPool
+from continuation import MAX_CONTINUATIONS, Stitcher, is_truncated
+from generation_cache import GenerationCache, make_cache_key, make_cache_namespace, normalize_prompt
+from hedging import (
+    MAX_ATTEMPTS,
+    GenerationDeadlineExceeded,
+    LatencyTracker,
+    OpenedStream,
+    backoff_delay,
+    hedged_open,
+    is_retryable,
+)
+from jobs import QUEUED, RUNNING, SUCCEEDED, JobQueue, JobStore, QueueFullError
+from json_extract import find_files_object
+from json_repair import InvalidModelJSON, loads_tolerant, salvage_files
+from model_residency import ModelResidency
+from ollama_client import (
+    GENERATION_OPTIONS,
+    MODEL_NAME,
+    NUM_CTX,
+    OutputFormatUnsupported,
+    PromptPrefixCache,
+    fetch_model_digest,
+    format_name,
+    stream_ai_tokens,
+)
+from progress import ProgressChannel, format_sse
+from prompts import CONTINUE, FILE, GENERATE, PLAN, REGENERATE, TEMPLATES, PromptTemplate
+from releases import ProjectReleases
+from singleflight import SingleFlight
+from sizing import SizingEngine
+from story_index import StoryIndex
+from stream_guard import StreamDerailed, StreamGuard, adjusted_options
+from stream_parser import StreamingFilesParser
 
 # ✅ Setup Logging (`backend.log`)
 LOG_FILE = "backend.log"
@@ -17,142 +54,736 @@ logging.basicConfig(
 )
 logging.info("🚀 FastAPI Backend Started")
 
+
+# ✅ App Lifespan: own the Ollama backend pool and generation cache
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.backend_pool = BackendPool()
+    app.state.backend_pool.start()
+    app.state.generation_cache = GenerationCache(CACHE_DIR, max_entries=CACHE_MAX_ENTRIES)
+    app.state.model_digest = None
+    app.state.prefix_cache = PromptPrefixCache()
+    app.state.latency = {}
+    app.state.sizing = SizingEngine(NUM_CTX)
+    app.state.output_stats = {
+        "structured": 0, "unconstrained": 0, "reparsed": 0, "malformed": 0, "resumed": 0,
+        "partial": 0, "regenerated_files": 0, "repairs": {}, "aborted": {"prose": 0, "loop": 0},
+    }
+    app.state.story_index = await asyncio.to_thread(StoryIndex, STORY_INDEX_PATH)
+    app.state.singleflight = SingleFlight()
+    app.state.releases = await asyncio.to_thread(ProjectReleases, PROJECT_DIR, keep=PROJECT_RELEASES_KEEP)
+
+    # ✅ Pre-load the model on every host; /health/ready reports when resident
+    app.state.residency = {
+        endpoint.url: ModelResidency(endpoint.client) for endpoint in app.state.backend_pool.endpoints
+    }
+    for residency in app.state.residency.values():
+        residency.start()
+
+    # ✅ Durable job queue drained by background workers
+    app.state.job_flights = {}
+    app.state.job_store = await asyncio.to_thread(JobStore, JOBS_DB_PATH)
+    app.state.job_queue = JobQueue(
+        app.state.job_store, run_job, workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE
+    )
+    await app.state.job_queue.start()
+    try:
+        yield
+    finally:
+        await app.state.job_queue.stop()
+        app.state.job_store.close()
+        for residency in app.state.residency.values():
+            await residency.stop()
+        await app.state.backend_pool.stop()
+
+
 # ✅ Define FastAPI App
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # ✅ Project Directory
 BASE_DIR = os.path.dirname(__file__)
 PROJECT_DIR = os.path.join(BASE_DIR, "generated-projects", "ReactApp")
 PACKAGE_JSON_PATH = os.path.join(PROJECT_DIR, "package.json")
+PROJECT_RELEASES_KEEP = int(os.getenv("PROJECT_RELEASES_KEEP", "5"))  # published versions kept for rollback
+
+# ✅ Generation Cache
+CACHE_DIR = os.getenv("GENERATION_CACHE_DIR", os.path.join(BASE_DIR, ".generation-cache"))
+CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "256"))
+MODEL_DIGEST_TTL = 300  # seconds before re-checking which weights are loaded
+CACHE_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+# ✅ Near-Duplicate Story Reuse (estimated Jaccard similarity of word shingles)
+STORY_INDEX_PATH = os.path.join(CACHE_DIR, "story-index.jsonl")
+NEAR_DUPLICATE_SERVE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_SERVE_THRESHOLD", "0.9"))
+NEAR_DUPLICATE_OFFER_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_OFFER_THRESHOLD", "0.6"))
+
+# ✅ Generation Mode: "single" prompt, or "fanout" (plan, then one call per file)
+GENERATION_MODE = os.getenv("GENERATION_MODE", "single")
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+MAX_PLANNED_FILES = 30
+
+# ✅ Job Queue
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(BASE_DIR, "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_EVENTS_POLL_INTERVAL = 0.5
+
+# ✅ Batch Generation
+BATCH_MAX_STORIES = int(os.getenv("BATCH_MAX_STORIES", "200"))
 
 
 # ✅ API Request Model
 class UserStoryRequest(BaseModel):
     text: str
+    regenerate: bool = False  # bypass cached results ("Regenerate" button)
+    priority: int = 0  # higher runs first when queued as a job
+
+
+class BatchRequest(BaseModel):
+    stories: list[str]
+    regenerate: bool = False
 
 
 # ✅ Check if Node.js and npm are installed
-def check_npm():
+async def check_npm():
     """Check if npm is installed and accessible."""
     try:
-        subprocess.run(["npm", "--version"], check=True, capture_output=True, text=True)
-        return True
+        process = await asyncio.create_subprocess_exec(
+            "npm", "--version",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        await process.communicate()
+        return process.returncode == 0
     except FileNotFoundError:
         logging.error("❌ npm not found. Install Node.js and add it to PATH.")
         return False
 
 
-# ✅ **Fix AI Response Parsing**
-def parse_ai_response(response_text: str) -> dict:
-    """Extract valid JSON from AI response, handling extra text."""
+# ✅ **Parse Model JSON, Repairing Small Defects**
+def load_model_json(json_text: str, repairs: list = None):
+    """``json.loads`` with the repair stage; applied fixes are added to ``repairs``."""
     try:
-        response_text = response_text.strip()
+        parsed_data, fixes = loads_tolerant(json_text)
+    except InvalidModelJSON:
+        logging.error("❌ AI Response JSON Error: not valid JSON, even after repair")
+        logging.error(f"🔴 Raw AI Response: {json_text[:500]}...")
+        raise
 
-        # ✅ **Fix AI JSON Output Formatting**
-        response_text = response_text.replace("```json", "").replace("```", "").strip()
+    if fixes:
+        logging.warning(f"🩹 Repaired AI JSON ({', '.join(fixes)})")
+        if repairs is not None:
+            repairs.extend(fixes)
+    return parsed_data
 
-        # ✅ **Ensure JSON starts with '{'**
-        json_match = re.search(r"\{.*\}", response_text, re.DOTALL)
-        if not json_match:
-            raise ValueError("No valid JSON found in AI response.")
 
-        json_text = json_match.group(0).strip()
+# ✅ **Parse the {"files": ...} Object, Keeping Valid Entries**
+def load_files_json(json_text: str, repairs: list = None, broken: list = None) -> dict:
+    """Parse the files object; with ``broken`` given, accept a partial result.
 
-        # ✅ Log Cleaned JSON Before Parsing
-        logging.info(f"🔍 Cleaned AI JSON Response: {json_text[:500]}...")
+    Entries whose value is not a string, or that were cut off, are left out
+    and their paths added to ``broken``. If even the repaired document does
+    not parse, the entries are salvaged one by one. Without ``broken`` any
+    unparseable or truncated document raises InvalidModelJSON.
+    """
+    fixes = []
+    try:
+        parsed_data = load_model_json(json_text, fixes)
+    except InvalidModelJSON:
+        if broken is None:
+            raise
+        files, lost = salvage_files(json_text)
+        if not files:
+            raise
+        fixes = ["salvaged_entries"]
+    else:
+        if not isinstance(parsed_data, dict) or not isinstance(parsed_data.get("files"), dict):
+            raise ValueError("Invalid AI response format: Missing 'files' key.")
+        files = parsed_data["files"]
+        lost = []
+        if broken is None and "truncated_entry" in fixes:
+            # ✅ The repair dropped a cut-off entry; a strict caller cannot accept a partial result
+            raise InvalidModelJSON()
+        if broken is not None:
+            lost = [path for path, content in files.items() if not isinstance(content, str)]
+            if "truncated_entry" in fixes:
+                # ✅ The repair dropped the last entry; find out which path it was
+                lost += [path for path in salvage_files(json_text)[1] if path not in files]
+            files = {path: content for path, content in files.items() if isinstance(content, str)}
 
-        # ✅ **Parse JSON safely**
-        parsed_data = json.loads(json_text)
+    if repairs is not None:
+        repairs.extend(fixes)
+    if lost:
+        logging.warning(f"🧩 Kept {len(files)} valid files, {len(lost)} broken: {', '.join(lost)}")
+        broken.extend(lost)
+    return files
 
-        if "files" not in parsed_data:
-            raise ValueError("Invalid AI response format: Missing 'files' key.")
 
-        return parsed_data["files"]
+# ✅ **Parse Schema-Constrained Output (no scraping needed)**
+def parse_structured_response(response_text: str, repairs: list = None, broken: list = None) -> dict:
+    """Parse output produced under ``format``; it must already be pure JSON."""
+    return load_files_json(response_text, repairs, broken)
+
+
+# ✅ **Fix AI Response Parsing (fallback for backends without structured output)**
+def parse_ai_response(response_text: str, repairs: list = None, broken: list = None) -> dict:
+    """Extract valid JSON from AI response, handling extra text."""
+    # ✅ **Find the {"files": ...} object; fences and prose around it are skipped**
+    span = find_files_object(response_text)
+    if span is None:
+        raise ValueError("No valid JSON found in AI response.")
+
+    start, end = span
+    json_text = response_text[start:end]
+
+    # ✅ Log Cleaned JSON Before Parsing
+    logging.info(f"🔍 Cleaned AI JSON Response: {json_text[:500]}...")
+
+    # ✅ **Parse JSON, repairing trailing commas, raw newlines, missing braces...**
+    return load_files_json(json_text, repairs, broken)
+
 
-    except json.JSONDecodeError as e:
-        logging.error(f"❌ AI Response JSON Error: {str(e)}")
-        logging.error(f"🔴 Raw AI Response: {response_text[:500]}...")
-        raise HTTPException(status_code=500, detail="Invalid JSON from AI.")
+# ✅ **Per-File Prompt (fan-out mode)**
+def build_file_prompt(user_story: str, manifest: dict, filepath: str) -> str:
+    """Per-file prompt: the story, the whole plan, and the one file to write."""
+    plan = "\n".join(f"- {path}: {purpose}" for path, purpose in manifest.items())
+    return FILE.render(user_story=user_story, plan=plan, filepath=filepath)
+
+
+# ✅ **Options That Change the Output (part of the cache key)**
+def cache_options() -> dict:
+    if GENERATION_MODE == "single":
+        return GENERATION_OPTIONS
+    # ✅ Fan-out output depends on the plan and file templates, not the story prompt
+    return {**GENERATION_OPTIONS, "mode": GENERATION_MODE, "templates": [PLAN.version, FILE.version]}
+
+
+# ✅ **Resolve Model Digest (cached for MODEL_DIGEST_TTL)**
+async def get_model_digest() -> str:
+    cached = app.state.model_digest
+    if cached and time.monotonic() - cached[1] < MODEL_DIGEST_TTL:
+        return cached[0]
+    digest = await fetch_model_digest(app.state.backend_pool.any_client())
+    if cached and cached[0] != digest:
+        # ✅ New weights: previously evaluated prefixes are stale
+        app.state.prefix_cache.invalidate()
+    app.state.model_digest = (digest, time.monotonic())
+    return digest
 
 
 # ✅ **Send User Story to AI & Handle Response**
-def generate_code_from_ai(user_story: str):
-    """Send user story to AI and get structured JSON response for React code."""
+async def generate_code_from_ai(
+    user_story: str, on_file=None, progress: ProgressChannel = None, use_cache: bool = True, incomplete: list = None
+):
+    """Send user story to AI and get structured JSON response for React code.
+
+    ``on_file(path, content)`` is called for each file as soon as its JSON
+    string closes in the token stream, before the model has finished.
+    Token counts and throughput are published to ``progress`` if given.
+    Results are cached by model, digest, options and prompt; ``use_cache=False``
+    skips the lookup but still refreshes the cached entry. On an exact miss, a
+    near-duplicate story above NEAR_DUPLICATE_SERVE_THRESHOLD is served from
+    the cache, and one above NEAR_DUPLICATE_OFFER_THRESHOLD is offered via
+    a ``similar_story`` progress event whose files can be fetched from
+    ``GET /generations/{cache_key}``. Only stories generated with the same
+    model, weights, options and template are considered. Paths that could not
+    be generated are appended to ``incomplete`` when it is given.
+    """
     try:
         logging.info(f"🔍 Sending User Story to AI: {user_story}")
 
-        prompt = f"""
-        **INSTRUCTIONS FOR AI MODEL:**
-        - Return JSON ONLY, do NOT include any explanations.
-        - Do NOT include markdown like ```json.
-        - Ensure the JSON includes all required React files.
-
-        **User Story:**
-        {user_story}
-
-        **Expected JSON Output:**
-        {{
-            "files": {{
-                "src/App.js": "... React App.js code ...",
-                "src/index.js": "... ReactDOM code ...",
-                "src/components/Dashboard.js": "... Dashboard component ...",
-                "src/components/Dashboard.css": "... Dashboard styles ...",
-                "src/components/Navbar.js": "... Navigation bar ...",
-                "src/components/Navbar.css": "... Navbar styles ...",
-                "src/utils/auth.js": "... Logout handling ...",
-                "package.json": "... dependencies ...",
-                "public/index.html": "... main HTML file ..."
-            }}
-        }}
-        """
-
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={"model": "deepseek-coder-v2:16b", "prompt": prompt},
-        )
+        prompt = GENERATE.render(user_story=user_story)
+        cache = app.state.generation_cache
+        story_index = app.state.story_index
+        digest = await get_model_digest()
+        cache_key = make_cache_key(MODEL_NAME, digest, cache_options(), GENERATE.system + prompt)
+        namespace = make_cache_namespace(MODEL_NAME, digest, cache_options(), GENERATE.version)
 
-        if response.status_code != 200:
-            logging.error(f"❌ AI Model Error: {response.status_code}")
-            raise HTTPException(status_code=500, detail="AI failed to generate code.")
+        # ✅ Serve repeated stories from the cache
+        if use_cache:
+            cached_files = await asyncio.to_thread(cache.get, cache_key)
+            if cached_files:
+                logging.info(f"⚡ Cache hit for user story ({cache_key[:12]}), {len(cached_files)} files")
+                if progress:
+                    progress.stage("cache_hit")
+                return await replay_cached_files(cached_files, on_file)
 
-        # ✅ Log Raw AI Response
-        raw_ai_response = response.text.strip()
-        logging.info(f"✅ AI Raw Response: {raw_ai_response[:500]}...")
+            # ✅ Reuse results of near-duplicate stories
+            match = story_index.query(user_story, namespace)
+            similar_output_chars = None
+            if match:
+                similar_key, similarity = match
+                if similarity >= NEAR_DUPLICATE_SERVE_THRESHOLD:
+                    similar_files = await asyncio.to_thread(cache.get, similar_key)
+                    if similar_files:
+                        logging.info(f"⚡ Near-duplicate hit ({similar_key[:12]}, similarity={similarity:.2f})")
+                        if progress:
+                            progress.stage("near_duplicate_hit", similarity=similarity)
+                        return await replay_cached_files(similar_files, on_file)
+                    story_index.remove(similar_key)
+                elif similarity >= NEAR_DUPLICATE_OFFER_THRESHOLD:
+                    logging.info(f"🔎 Similar story found ({similar_key[:12]}, similarity={similarity:.2f})")
+                    if progress:
+                        progress.emit(
+                            "similar_story",
+                            cache_key=similar_key,
+                            similarity=similarity,
+                            files_url=f"/generations/{similar_key}",
+                        )
+                    similar_files = await asyncio.to_thread(cache.get, similar_key)
+                    if similar_files:
+                        similar_output_chars = sum(len(content) for content in similar_files.values())
+        else:
+            similar_output_chars = None
 
-        # ✅ Parse AI Response
-        return parse_ai_response(raw_ai_response)
+        if GENERATION_MODE == "fanout":
+            files, missing = await fan_out_files_from_ai(user_story, on_file=on_file, progress=progress)
+        else:
+            broken = []
+            files = await stream_files_from_ai(
+                prompt, on_file=on_file, progress=progress, similar_output_chars=similar_output_chars, broken=broken
+            )
+            missing = await regenerate_files(user_story, files, broken, on_file, progress) if broken else []
+        if not files:
+            raise ValueError("AI did not return any files.")
+        if missing:
+            # ✅ Keep the partial project, but do not cache it
+            logging.warning(f"⚠️ Returning {len(files)} files without {', '.join(missing)}")
+            if progress:
+                progress.emit("files_missing", files=missing)
+            if incomplete is not None:
+                incomplete.extend(missing)
+            return files
+        await asyncio.to_thread(cache.put, cache_key, files)
+        await asyncio.to_thread(story_index.add, user_story, cache_key, namespace)
+        return files
 
     except Exception as e:
         logging.error(f"❌ AI Processing Error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to process user story.")
 
 
-# ✅ **Ensure Required Files Exist**
-def save_generated_files(files: dict):
-    """Save AI-generated React files and auto-create missing ones."""
+# ✅ **Replay a Cached Result Through on_file**
+async def replay_cached_files(files: dict, on_file=None) -> dict:
+    if on_file:
+        for filepath, content in files.items():
+            await on_file(filepath, content)
+    return files
+
+
+# ✅ **Open a Backend Stream (waits for the first token)**
+async def open_token_stream(
+    prompt: str, system: str, options: dict, exclude: set, claim: dict, structured: bool = True
+) -> OpenedStream:
+    stack = AsyncExitStack()
+    try:
+        endpoint = await stack.enter_async_context(
+            app.state.backend_pool.acquire(MODEL_NAME, exclude=exclude)
+        )
+        claim["backend"] = endpoint.url
+        if "acquired" in claim:
+            claim["acquired"].set()
+        context = await app.state.prefix_cache.get(endpoint.client, system)
+        while True:
+            # ✅ Ask for schema-constrained output; step down if the host rejects it
+            output_format = endpoint.output_format if structured else None
+            stats = {"output_format": format_name(output_format)}
+            tokens = stream_ai_tokens(
+                endpoint.client, prompt, stats,
+                system=system, context=context, options=options, output_format=output_format,
+            )
+            stack.push_async_callback(tokens.aclose)
+            try:
+                first_token = await anext(tokens, None)
+                break
+            except OutputFormatUnsupported:
+                endpoint.downgrade_output_format()
+    except BaseException as e:
+        await stack.__aexit__(type(e), e, e.__traceback__)
+        raise
+    return OpenedStream(stack, endpoint.url, first_token, tokens, stats)
+
+
+# ✅ **Stream Files from the Model (hedged, with retries)**
+async def stream_files_from_ai(
+    prompt: str,
+    on_file=None,
+    progress: ProgressChannel = None,
+    template: PromptTemplate = GENERATE,
+    expected_files: int = None,
+    similar_output_chars: int = None,
+    broken: list = None,
+) -> dict:
+    """Run one generation, emitting files as they close in the token stream.
+
+    ``num_predict`` is sized per request from the expected file count or a
+    similar story's output size; ``num_ctx`` stays pinned at NUM_CTX. Backend failures and stalled
+    generations are retried with jittered backoff, up to MAX_ATTEMPTS; other
+    failures are raised immediately. Latency is tracked per template version
+    and sizing per template name. If ``broken`` is a list, output with some
+    unusable entries is accepted and their paths are appended to it.
+    """
+    kind = template.name
+    tracker = app.state.latency.setdefault(template.version, LatencyTracker())
+    counts = template.count(prompt)
+    sizing = app.state.sizing.size(kind, counts["prompt_tokens"], expected_files, similar_output_chars)
+    options = {"num_ctx": sizing["num_ctx"], "num_predict": sizing["num_predict"]}
+    if progress:
+        progress.emit("prompt", **counts)
+
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            files, stats, output_chars = await stream_files_attempt(
+                prompt, on_file, progress, template.system, options, tracker, partial_ok=broken is not None
+            )
+            template.record(counts, stats)
+            app.state.sizing.record(kind, sizing, stats, output_chars, len(files))
+            if stats["broken"]:
+                broken.extend(stats["broken"])
+            return files
+        except Exception as e:
+            if not is_retryable(e) or attempt == MAX_ATTEMPTS - 1:
+                raise
+            if isinstance(e, (StreamDerailed, InvalidModelJSON)):
+                # ✅ The backend is fine; retry at once with options that counter the failure
+                delay = 0
+                options = adjusted_options({**GENERATION_OPTIONS, **options}, e.reason)
+            else:
+                delay = backoff_delay(attempt)
+            detail = getattr(e, "detail", str(e))
+            logging.warning(f"🔁 Retrying AI generation in {delay:.1f}s (attempt {attempt + 2}): {detail}")
+            if progress:
+                progress.stage("retrying", attempt=attempt + 2, detail=detail)
+            await asyncio.sleep(delay)
+
+
+async def stream_files_attempt(
+    prompt: str,
+    on_file,
+    progress: ProgressChannel,
+    system: str,
+    options: dict,
+    tracker: LatencyTracker,
+    partial_ok: bool = False,
+):
+    """One hedged generation; returns ``(files, stats, output_chars)``.
+
+    With ``partial_ok``, unusable entries are dropped instead of failing the
+    attempt; their paths are listed in ``stats["broken"]``.
+    """
+    # ✅ Parse files incrementally while tokens are still streaming
+    parser = StreamingFilesParser()
+    guard = StreamGuard()
+    tokens = []
+    deadline = tracker.generation_deadline(options["num_predict"])
+    pool = app.state.backend_pool
+    try:
+        # ✅ The deadline runs from when a backend slot is held, not while queued for one
+        async with asyncio.timeout(None) as timer:
+            stream = await hedged_open(
+                lambda exclude, claim: open_token_stream(prompt, system, options, exclude, claim),
+                tracker.ttft_deadline(),
+                can_hedge=lambda exclude: pool.has_free_slot(MODEL_NAME, exclude),
+                on_acquired=lambda: timer.reschedule(asyncio.get_running_loop().time() + deadline),
+            )
+            async with stream:
+                await consume_stream(stream, parser, guard, tokens, on_file, progress)
+            tracker.record(stream.stats)
+            stats = dict(stream.stats, continuations=0, broken=[])
+
+            # ✅ Truncated mid-JSON: continue from the partial output instead of restarting
+            while is_truncated(parser) and stats["continuations"] < MAX_CONTINUATIONS:
+                # ✅ Each continuation is another generation of up to num_predict tokens
+                timer.reschedule(timer.when() + deadline)
+                await resume_generation(prompt, system, options, parser, guard, tokens, on_file, progress, stats)
+    except TimeoutError:
+        logging.error(f"❌ AI generation exceeded its {deadline:.0f}s deadline")
+        raise GenerationDeadlineExceeded(deadline)
+    except StreamDerailed as e:
+        # ✅ Leaving the stream context closed the upstream request
+        app.state.output_stats["aborted"][e.reason] += 1
+        logging.warning(f"🛑 Aborted generation after {guard.chars} chars: {e.detail}")
+        raise
+
+    if progress:
+        progress.tokens(stats, force=True)
+
+    output_stats = app.state.output_stats
+    structured = stream.stats["output_format"] != "none"
+    output_stats["structured" if structured else "unconstrained"] += 1
+
+    raw_ai_response = "".join(tokens)
+    if parser.done and not parser.error:
+        if stats["continuations"]:
+            output_stats["resumed"] += 1
+        if parser.broken:
+            # ✅ Valid JSON, but some entries are not file contents (objects, null...)
+            logging.warning(f"🧩 Kept {len(parser.files)} valid files, {len(parser.broken)} broken: {', '.join(parser.broken)}")
+            if not partial_ok:
+                output_stats["malformed"] += 1
+                raise InvalidModelJSON()
+            stats["broken"].extend(parser.broken)
+            output_stats["partial"] += 1
+        files = parser.files
+    else:
+        # ✅ Fall back to parsing the full response; scrape only unconstrained output
+        raw_ai_response = raw_ai_response.strip()
+        logging.warning(f"⚠️ Streaming parse incomplete ({parser.error or 'unterminated JSON'}), re-parsing full response.")
+        logging.info(f"✅ AI Raw Response: {raw_ai_response[:500]}...")
+        output_stats["reparsed"] += 1
+        repairs = []
+        broken = stats["broken"] if partial_ok else None
+        try:
+            if structured and not stats["continuations"]:
+                files = parse_structured_response(raw_ai_response, repairs, broken)
+            else:
+                files = parse_ai_response(raw_ai_response, repairs, broken)
+        except Exception:
+            output_stats["malformed"] += 1
+            raise
+        for fix in repairs:
+            output_stats["repairs"][fix] = output_stats["repairs"].get(fix, 0) + 1
+        if stats["broken"]:
+            output_stats["partial"] += 1
+
+    if not files and not stats["broken"]:
+        # ✅ {"files": {}} parses, but is no project; regenerate it like invalid output
+        logging.warning("⚠️ AI returned an empty files object")
+        output_stats["malformed"] += 1
+        raise InvalidModelJSON()
+    return files, stats, len(raw_ai_response)
+
+
+async def consume_stream(stream, parser, guard, tokens: list, on_file, progress, stitcher: Stitcher = None):
+    """Feed a token stream through the validators and parser, emitting files."""
+
+    async def consume(token):
+        tokens.append(token)
+        if progress:
+            progress.tokens(stream.stats)
+        completed = parser.feed(token)
+        guard.check(token, parser)
+        for filepath, content in completed:
+            logging.info(f"📄 File streamed: {filepath} ({len(content)} chars)")
+            if on_file:
+                await on_file(filepath, content)
+
+    async for token in stream:
+        if stitcher:
+            token = stitcher.feed(token)
+        if token:
+            await consume(token)
+    if stitcher:
+        tail = stitcher.close()
+        if tail:
+            await consume(tail)
+
+
+# ✅ **Resume a Truncated Generation**
+async def resume_generation(
+    prompt: str, system: str, options: dict, parser, guard, tokens: list, on_file, progress, stats: dict
+):
+    """Ask the model to continue ``tokens`` and stitch its answer onto them.
+
+    The continuation is fed into the same parser, so files keep streaming
+    and the stitched text is validated as it arrives. ``stats`` accumulates
+    the token counts of every continuation.
+    """
+    partial = "".join(tokens)
+    stats["continuations"] += 1
+    logging.warning(
+        f"✂️ Output truncated after {len(partial)} chars (done_reason={stats.get('done_reason')}), "
+        f"requesting continuation {stats['continuations']}"
+    )
+    if progress:
+        progress.stage("resuming", continuation=stats["continuations"], chars=len(partial))
+
+    continuation_prompt = CONTINUE.render(instructions=system.strip(), prompt=prompt.strip(), partial=partial)
+    counts = CONTINUE.count(continuation_prompt)
+    continuation_options = {
+        **options,
+        "num_predict": app.state.sizing.predict_for(counts["prompt_tokens"], options["num_predict"]),
+    }
+
+    # ✅ No format constraint: the answer is the rest of a document, not a new object
+    stream = await open_token_stream(
+        continuation_prompt, CONTINUE.system, continuation_options, set(), {}, structured=False
+    )
+    stitcher = Stitcher(partial)
+    async with stream:
+        await consume_stream(stream, parser, guard, tokens, on_file, progress, stitcher)
+    CONTINUE.record(counts, stream.stats)
+    if stitcher.overlap:
+        logging.info(f"🧵 Dropped {stitcher.overlap} repeated chars when stitching")
+
+    for key in ("token_count", "eval_count"):
+        stats[key] = (stats.get(key) or 0) + (stream.stats.get(key) or 0)
+    stats["duration"] = (stats.get("duration") or 0) + (stream.stats.get("duration") or 0)
+    stats["done_reason"] = stream.stats.get("done_reason")
+
+
+# ✅ **Plan, Then Generate Files in Parallel**
+async def fan_out_files_from_ai(user_story: str, on_file=None, progress: ProgressChannel = None) -> tuple:
+    """Two-phase generation: a short planning call, then one call per file.
+
+    Per-file calls run concurrently, at most FANOUT_CONCURRENCY at a time, so
+    output tokens are spread across the backend's parallel slots. A failed
+    file does not cancel the others; all failed files are regenerated in one
+    targeted call at the end. Returns ``(files, missing_paths)``.
+    """
+    if progress:
+        progress.stage("planning")
+    manifest = await stream_files_from_ai(PLAN.render(user_story=user_story), template=PLAN)
+    if not manifest:
+        raise ValueError("AI returned an empty project plan.")
+    if len(manifest) > MAX_PLANNED_FILES:
+        logging.warning(f"⚠️ Plan lists {len(manifest)} files, keeping the first {MAX_PLANNED_FILES}")
+        manifest = dict(list(manifest.items())[:MAX_PLANNED_FILES])
+
+    logging.info(f"🗺️ Project plan: {', '.join(manifest)}")
+    if progress:
+        progress.stage("generating_files", files=sorted(manifest), concurrency=FANOUT_CONCURRENCY)
+
+    semaphore = asyncio.Semaphore(FANOUT_CONCURRENCY)
+    files = {}
+    failed = []
+
+    async def generate_file(filepath: str):
+        try:
+            async with semaphore:
+                generated = await stream_files_from_ai(
+                    build_file_prompt(user_story, manifest, filepath), template=FILE, expected_files=1
+                )
+            content = pick_file(generated, filepath)
+            if content is None:
+                raise ValueError(f"AI did not return the requested file {filepath}.")
+        except Exception as e:
+            logging.warning(f"⚠️ File {filepath} failed: {getattr(e, 'detail', e)}")
+            failed.append(filepath)
+            return
+
+        files[filepath] = content
+        logging.info(f"📄 File generated: {filepath} ({len(content)} chars)")
+        if on_file:
+            await on_file(filepath, content)
+
+    async with asyncio.TaskGroup() as group:
+        for filepath in manifest:
+            group.create_task(generate_file(filepath))
+
+    if not files:
+        raise ValueError("AI did not return any of the planned files.")
+    missing = await regenerate_files(user_story, files, failed, on_file, progress, manifest) if failed else []
+    return {filepath: files[filepath] for filepath in manifest if filepath in files}, missing
+
+
+# ✅ **Pick the Requested File From a Generation**
+def pick_file(generated: dict, filepath: str):
+    """The content for ``filepath``; a lone file under another name also counts."""
+    if filepath in generated:
+        return generated[filepath]
+    if len(generated) == 1:
+        return next(iter(generated.values()))
+    return None
+
+
+# ✅ **Regenerate Only the Missing or Broken Files**
+async def regenerate_files(
+    user_story: str, files: dict, wanted: list, on_file=None, progress: ProgressChannel = None, plan: dict = None
+) -> list:
+    """Ask for ``wanted`` alone, with the valid files listed by path as context.
+
+    The prompt and output budget scale with the number of bad files, not the
+    project size. Regenerated files are added to ``files`` (and passed to
+    ``on_file``); returns the paths that are still missing.
+    """
+    wanted = list(dict.fromkeys(wanted))
+    logging.info(f"🩹 Regenerating {len(wanted)} missing or broken files: {', '.join(wanted)}")
+    if progress:
+        progress.stage("regenerating_files", files=wanted)
+
+    def describe(path: str) -> str:
+        return f"- {path}: {plan[path]}" if plan and path in plan else f"- {path}"
+
+    prompt = REGENERATE.render(
+        user_story=user_story,
+        existing="\n".join(describe(path) for path in files) or "(none)",
+        requested="\n".join(describe(path) for path in wanted),
+    )
+    try:
+        generated = await stream_files_from_ai(
+            prompt, progress=progress, template=REGENERATE, expected_files=len(wanted), broken=[]
+        )
+    except Exception as e:
+        logging.error(f"❌ Regeneration failed: {getattr(e, 'detail', e)}")
+        return wanted
+
+    if len(wanted) == 1:
+        content = pick_file(generated, wanted[0])
+        generated = {wanted[0]: content} if content is not None else {}
+    for filepath in wanted:
+        if filepath in generated:
+            files[filepath] = generated[filepath]
+            app.state.output_stats["regenerated_files"] += 1
+            logging.info(f"📄 File regenerated: {filepath} ({len(generated[filepath])} chars)")
+            if on_file:
+                await on_file(filepath, generated[filepath])
+    return [filepath for filepath in wanted if filepath not in files]
+
+
+# ✅ **Save a Single Generated File**
+def _write_file(full_path: str, content: str):
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+async def save_generated_file(release_id: str, filepath: str, content: str):
+    """Stage one AI-generated file for release ``release_id`` off the event loop."""
+    await asyncio.to_thread(app.state.releases.write, release_id, filepath, content)
+    logging.info(f"✅ File Staged: {filepath} ({release_id})")
+
+
+# ✅ **Stage, Then Publish the Whole Project at Once**
+async def save_generated_files(
+    files: dict, release_id: str = None, paths: list = None, complete: bool = True
+) -> dict:
+    """Stage AI-generated React files and publish the release to the live project.
+
+    Files already staged while streaming can be left out of ``files``;
+    ``paths`` then lists every file of the result, and anything else in the
+    staging directory (from an aborted attempt) is not published. The
+    live project only changes in ``publish()``, after every file is staged,
+    and only for files whose content hash differs from the last release.
+    With ``complete=False`` the previous versions of files the result lacks
+    are kept rather than deleted. Returns the publish summary (added,
+    changed, unchanged and deleted files).
+    """
+    releases = app.state.releases
     try:
         logging.info("📂 Saving AI-generated files...")
+        release_id = release_id or await asyncio.to_thread(releases.create)
 
-        # ✅ Save AI-generated files
-        for filepath, content in files.items():
-            full_path = os.path.join(PROJECT_DIR, filepath)
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(content)
-            logging.info(f"✅ File Saved: {full_path}")
+        # ✅ Stage AI-generated files concurrently
+        await asyncio.gather(*(
+            save_generated_file(release_id, filepath, content)
+            for filepath, content in files.items()
+        ))
+        return await asyncio.to_thread(releases.publish, release_id, paths, complete)
 
     except Exception as e:
         logging.error(f"❌ Error Writing Files: {str(e)}")
+        await asyncio.to_thread(releases.discard, release_id)
         raise HTTPException(status_code=500, detail="Failed to save AI-generated files.")
 
 
 # ✅ **Ensure package.json is valid**
-def ensure_package_json():
+async def ensure_package_json():
     """Ensure package.json exists and add missing dependencies."""
     try:
-        os.makedirs(PROJECT_DIR, exist_ok=True)
+        await asyncio.to_thread(os.makedirs, PROJECT_DIR, exist_ok=True)
 
-        if not os.path.exists(PACKAGE_JSON_PATH):
+        if not await asyncio.to_thread(os.path.exists, PACKAGE_JSON_PATH):
             logging.warning("⚠️ package.json not found. Creating a new one.")
             package_json = {
                 "name": "react-app",
@@ -166,62 +797,393 @@ def ensure_package_json():
                     "eject": "react-scripts eject"
                 }
             }
-            with open(PACKAGE_JSON_PATH, "w", encoding="utf-8") as f:
-                json.dump(package_json, f, indent=2)
+            await asyncio.to_thread(_write_file, PACKAGE_JSON_PATH, json.dumps(package_json, indent=2))
 
-        install_dependencies()
+        await install_dependencies()
 
     except Exception as e:
         logging.error(f"❌ Failed to update package.json: {str(e)}")
 
 
 # ✅ **Install Dependencies**
-def install_dependencies():
+async def install_dependencies():
     """Run npm install to set up project dependencies."""
-    if not check_npm():
+    if not await check_npm():
         raise HTTPException(status_code=500, detail="npm not found. Install Node.js and add it to PATH.")
 
+    logging.info("📦 Installing dependencies...")
+    process = await asyncio.create_subprocess_exec("npm", "install", cwd=PROJECT_DIR)
     try:
-        logging.info("📦 Installing dependencies...")
-        subprocess.run(["npm", "install"], cwd=PROJECT_DIR, check=True)
-        logging.info("✅ Dependencies installed successfully.")
-    except subprocess.CalledProcessError as e:
-        logging.error(f"❌ Dependency installation failed: {str(e)}")
+        returncode = await process.wait()
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+
+    if returncode != 0:
+        logging.error(f"❌ Dependency installation failed: npm install exited with {returncode}")
         raise HTTPException(status_code=500, detail="Failed to install dependencies.")
+    logging.info("✅ Dependencies installed successfully.")
 
 
 # ✅ **Start React App**
-def start_react_app():
+async def start_react_app():
     """Run npm start to launch the React app."""
-    if not check_npm():
+    if not await check_npm():
         raise HTTPException(status_code=500, detail="npm not found. Install Node.js and add it to PATH.")
 
     try:
         logging.info("🚀 Starting React App...")
-        subprocess.Popen(["npm", "start"], cwd=PROJECT_DIR)
+        return await asyncio.create_subprocess_exec("npm", "start", cwd=PROJECT_DIR)
     except Exception as e:
         logging.error(f"❌ Failed to start React app: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to start React app.")
 
 
-# ✅ **FastAPI Endpoint: Generate Full React Project**
-@app.post("/generate-code/")
-def generate_code(user_story_request: UserStoryRequest):
-    """Generate React code dynamically from user story."""
+# ✅ **Run One Generation End to End**
+async def run_generation(user_story: str, progress: ProgressChannel = None, use_cache: bool = True) -> dict:
+    """Generate files for a user story and publish them to the React project.
+
+    Files are staged as they stream in; the live project changes once, when
+    the finished release is published.
+    """
+    progress = progress or ProgressChannel()
+    release_id = await asyncio.to_thread(app.state.releases.create)
     try:
-        logging.info(f"🔍 User Story Received: {user_story_request.text}")
+        progress.stage("generating")
+
+        # ✅ Get AI-generated React code, staging files as they stream in
+        written = {}
 
-        # ✅ Get AI-generated React code
-        generated_files = generate_code_from_ai(user_story_request.text)
+        async def on_file(filepath, content):
+            await save_generated_file(release_id, filepath, content)
+            written[filepath] = content
+            progress.emit("file_written", path=filepath, size=len(content))
 
-        # ✅ Save AI-generated code
-        save_generated_files(generated_files)
+        missing = []
+        generated_files = await generate_code_from_ai(
+            user_story, on_file=on_file, progress=progress, use_cache=use_cache, incomplete=missing
+        )
+
+        # ✅ Stage anything recovered only by the fallback parser, then publish
+        remaining = {
+            path: content for path, content in generated_files.items()
+            if written.get(path) != content
+        }
+        progress.stage("saving")
+        release = await save_generated_files(
+            remaining, release_id, paths=list(generated_files), complete=not missing
+        )
+        for filepath, content in remaining.items():
+            progress.emit("file_written", path=filepath, size=len(content))
+        progress.emit(
+            "published",
+            release=release["release"],
+            added=release["added"],
+            changed=release["changed"],
+            unchanged=release["unchanged"],
+            deleted=release["deleted"],
+        )
 
-        return {"success": True, "message": "✅ React project generated successfully!"}
+        progress.emit("done", files=sorted(generated_files))
+        return generated_files
 
+    except asyncio.CancelledError:
+        await asyncio.to_thread(app.state.releases.discard, release_id)
+        progress.emit("error", detail="Generation cancelled.")
+        raise
     except Exception as e:
-        logging.error(f"❌ Error in Code Generation: {str(e)}")
-        return {"error": str(e)}
+        await asyncio.to_thread(app.state.releases.discard, release_id)
+        progress.emit("error", detail=getattr(e, "detail", str(e)))
+        raise
+    finally:
+        progress.close()
+
+
+# ✅ **Coalescing Key for Identical Requests**
+def request_key(user_story_request: UserStoryRequest) -> str:
+    material = json.dumps(
+        {
+            "story": normalize_prompt(user_story_request.text),
+            "options": cache_options(),
+            "regenerate": user_story_request.regenerate,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# ✅ **Start or Join the Generation for a Request**
+def attach_generation(user_story_request: UserStoryRequest):
+    """Return the shared flight for this request, starting it if needed."""
+    return app.state.singleflight.attach(
+        request_key(user_story_request),
+        lambda progress: run_generation(
+            user_story_request.text, progress, use_cache=not user_story_request.regenerate
+        ),
+    )
+
+
+# ✅ **Job Handler: run a queued generation**
+async def run_job(job: dict) -> list:
+    """Run one queued job through the shared single-flight generation."""
+    flight = attach_generation(UserStoryRequest(**job["request"]))
+    app.state.job_flights[job["id"]] = flight
+    try:
+        files = await asyncio.shield(flight.task)
+    finally:
+        app.state.singleflight.detach(flight)
+        app.state.job_flights.pop(job["id"], None)
+    return sorted(files)
+
+
+# ✅ **Job Status View**
+def job_status(job: dict) -> dict:
+    now = time.time()
+    started_at, finished_at = job["started_at"], job["finished_at"]
+    return {
+        "job_id": job["id"],
+        "state": job["state"],
+        "priority": job["priority"],
+        "created_at": job["created_at"],
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "queued_seconds": (started_at or now) - job["created_at"],
+        "run_seconds": (finished_at or now) - started_at if started_at else None,
+        "files": job["files"],
+        "error": job["error"],
+    }
+
+
+# ✅ **Queue a Generation Job (503 when the queue is full)**
+async def submit_job(user_story_request: UserStoryRequest) -> dict:
+    try:
+        return await app.state.job_queue.submit(
+            user_story_request.model_dump(), priority=user_story_request.priority
+        )
+    except QueueFullError as e:
+        logging.warning(f"⚠️ {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+
+# ✅ **Progress Events of a Job (queued, running or finished)**
+async def job_events(job: dict):
+    """Yield a job's progress as SSE frames; waits while the job is still queued."""
+    job_id = job["id"]
+    current = job
+    yield format_sse({"event": "stage", "time": time.time(), "stage": current["state"], "job_id": job_id})
+
+    # ✅ Wait for a worker to pick the job up
+    while current["state"] in (QUEUED, RUNNING) and job_id not in app.state.job_flights:
+        await asyncio.sleep(JOB_EVENTS_POLL_INTERVAL)
+        current = await asyncio.to_thread(app.state.job_store.get, job_id)
+
+    flight = app.state.job_flights.get(job_id)
+    if flight:
+        async for payload in flight.progress.subscribe():
+            yield format_sse(payload)
+        return
+
+    status = job_status(current)
+    if current["state"] == SUCCEEDED:
+        yield format_sse({"event": "done", "time": time.time(), "files": status["files"]})
+    else:
+        yield format_sse({"event": "error", "time": time.time(), "detail": status["error"]})
+
+
+# ✅ **FastAPI Endpoint: Generate Full React Project (queued job)**
+@app.post("/generate-code/", status_code=202)
+async def generate_code(user_story_request: UserStoryRequest):
+    """Queue a generation and return its job id immediately (202 Accepted)."""
+    logging.info(f"🔍 User Story Received: {user_story_request.text}")
+
+    job = await submit_job(user_story_request)
+    status_url = f"/jobs/{job['id']}"
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job["id"], "state": job["state"], "status_url": status_url},
+        headers={"Location": status_url},
+    )
+
+
+# ✅ **FastAPI Endpoint: Job Status**
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Report a job's state, timings and produced files."""
+    job = await asyncio.to_thread(app.state.job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job_status(job)
+
+
+# ✅ **FastAPI Endpoint: Job Progress (SSE)**
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str):
+    """Stream a job's progress events; waits while the job is still queued."""
+    job = await asyncio.to_thread(app.state.job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    return StreamingResponse(
+        job_events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ✅ **FastAPI Endpoint: Stream Generation Progress (SSE)**
+@app.post("/generate-code/stream")
+async def generate_code_stream(user_story_request: UserStoryRequest):
+    """Queue a generation and push its progress events as Server-Sent Events.
+
+    Same as ``POST /generate-code/`` followed by ``GET /jobs/{id}/events``:
+    the job goes through the queue (priority, 503 when full) and keeps
+    running if the client disconnects.
+    """
+    logging.info(f"🔍 User Story Received (stream): {user_story_request.text}")
+
+    job = await submit_job(user_story_request)
+    status_url = f"/jobs/{job['id']}"
+    return StreamingResponse(
+        job_events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Location": status_url},
+    )
+
+
+# ✅ **Run a Batch of Stories Across Every Backend Slot**
+async def run_batch(stories: list, use_cache: bool, results: asyncio.Queue):
+    """Generate every story, putting one result event per story on ``results``.
+
+    One worker runs per generation slot across the healthy backends, so the
+    pool stays saturated and throughput scales with slot count. Duplicate
+    stories are generated once. A failed story is reported and the rest of
+    the batch carries on. Files are returned, not written to the project.
+    """
+    duplicates = {}
+    for index, story in enumerate(stories):
+        duplicates.setdefault(normalize_prompt(story), []).append(index)
+    pending = asyncio.Queue()
+    for indexes in duplicates.values():
+        pending.put_nowait(indexes)
+
+    async def worker():
+        while not pending.empty():
+            indexes = pending.get_nowait()
+            started = time.monotonic()
+            try:
+                files = await generate_code_from_ai(stories[indexes[0]], use_cache=use_cache)
+            except Exception as e:
+                logging.error(f"❌ Batch story {indexes[0]} failed: {getattr(e, 'detail', str(e))}")
+                result = {"event": "story_failed", "detail": getattr(e, "detail", str(e))}
+            else:
+                result = {"event": "story_done", "files": files}
+            result["seconds"] = round(time.monotonic() - started, 3)
+            for index in indexes:
+                await results.put({**result, "time": time.time(), "index": index})
+
+    workers = min(len(duplicates), app.state.backend_pool.capacity())
+    logging.info(f"📦 Batch of {len(stories)} stories ({len(duplicates)} unique) on {workers} slots")
+    async with asyncio.TaskGroup() as group:
+        for _ in range(workers):
+            group.create_task(worker())
+
+
+# ✅ **FastAPI Endpoint: Batch Generation (SSE, one event per story)**
+@app.post("/generate-code/batch")
+async def generate_code_batch(batch_request: BatchRequest):
+    """Generate many stories concurrently and stream each result as it finishes."""
+    stories = batch_request.stories
+    if not stories:
+        raise HTTPException(status_code=400, detail="Batch contains no stories.")
+    if len(stories) > BATCH_MAX_STORIES:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {BATCH_MAX_STORIES} stories.")
+
+    async def event_stream():
+        started = time.monotonic()
+        results = asyncio.Queue()
+        task = asyncio.create_task(run_batch(stories, not batch_request.regenerate, results))
+        yield format_sse({"event": "batch_started", "time": time.time(), "stories": len(stories)})
+        failed = 0
+        try:
+            for _ in stories:
+                result = await results.get()
+                failed += result["event"] == "story_failed"
+                yield format_sse(result)
+            elapsed = time.monotonic() - started
+            logging.info(f"📦 Batch finished in {elapsed:.1f}s ({failed} of {len(stories)} failed)")
+            yield format_sse({
+                "event": "batch_done",
+                "time": time.time(),
+                "succeeded": len(stories) - failed,
+                "failed": failed,
+                "seconds": round(elapsed, 3),
+            })
+        finally:
+            # ✅ Client went away: stop generating the rest of the batch
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ✅ **FastAPI Endpoint: Cached Generation (starting point for a similar story)**
+@app.get("/generations/{cache_key}")
+async def get_generation(cache_key: str):
+    """Return the cached files of a past generation, e.g. one offered as ``similar_story``."""
+    files = None
+    if CACHE_KEY_PATTERN.fullmatch(cache_key):
+        files = await asyncio.to_thread(app.state.generation_cache.get, cache_key)
+    if files is None:
+        raise HTTPException(status_code=404, detail="Generation not found.")
+    return {"cache_key": cache_key, "files": files}
+
+
+# ✅ **FastAPI Endpoint: Published Project Releases**
+@app.get("/project/releases")
+async def list_releases():
+    """List the published versions of the project kept for rollback, newest first."""
+    return {"releases": await asyncio.to_thread(app.state.releases.releases)}
+
+
+@app.post("/project/releases/{release_id}/restore")
+async def restore_release(release_id: str):
+    """Publish an earlier version of the project again."""
+    try:
+        release = await asyncio.to_thread(app.state.releases.restore, release_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Release not found.")
+    return release
+
+
+# ✅ **FastAPI Endpoint: Readiness (model resident)**
+@app.get("/health/ready")
+async def health_ready():
+    """Report ready once at least one backend has every configured model loaded."""
+    residency = {url: r.metrics() for url, r in app.state.residency.items()}
+    ready = any(state["ready"] for state in residency.values())
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "backends": residency})
+
+
+# ✅ **FastAPI Endpoint: Metrics**
+@app.get("/metrics")
+async def metrics():
+    """Model residency, load times, backend load, prompt sizes and cache statistics."""
+    return {
+        "models": {url: r.metrics() for url, r in app.state.residency.items()},
+        "backends": app.state.backend_pool.metrics(),
+        "latency": {version: tracker.metrics() for version, tracker in app.state.latency.items()},
+        "prompts": {name: template.metrics() for name, template in TEMPLATES.items()},
+        "sizing": app.state.sizing.metrics(),
+        "output": app.state.output_stats,
+        "cache": app.state.generation_cache.stats(),
+        "story_index": {"entries": len(app.state.story_index)},
+        "in_flight": len(app.state.singleflight.flights),
+        "jobs": {"queued": app.state.job_queue.depth(), "running": len(app.state.job_queue.running)},
+    }
 
 
 # ✅ **Start FastAPI Server**
@@ -0,0 +1,109 @@
+import os
+import time
+import asyncio
+import logging
+import httpx
+from ollama_client import KEEP_ALIVE, MODEL_NAME, NUM_CTX
+
+# ✅ Models to pre-load at startup (comma separated) and keep-alive cadence
+WARMUP_MODELS = [m.strip() for m in os.getenv("OLLAMA_WARMUP_MODELS", MODEL_NAME).split(",") if m.strip()]
+KEEPALIVE_INTERVAL = float(os.getenv("OLLAMA_KEEPALIVE_INTERVAL", "240"))
+WARMUP_RETRY_DELAY = 10
+
+
+# ✅ **Model Warm-up and Residency**
+class ModelResidency:
+    """Pre-load models on startup and keep them resident in Ollama.
+
+    A zero-length generate loads the weights without producing tokens, at the
+    same NUM_CTX every generation uses so the runner is not reloaded. The
+    background loop repeats it every KEEPALIVE_INTERVAL seconds and checks
+    /api/ps so ``state`` always reflects which models are actually loaded.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, models: list = None):
+        self.client = client
+        self.models = models or WARMUP_MODELS
+        self.state = {
+            model: {"resident": False, "load_seconds": None, "last_keepalive": None, "error": None}
+            for model in self.models
+        }
+        self._task = None
+
+    @property
+    def ready(self) -> bool:
+        return all(entry["resident"] for entry in self.state.values())
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def load(self, model: str) -> bool:
+        """Issue a zero-length generate so ``model`` is (re)loaded and pinned."""
+        entry = self.state[model]
+        start_time = time.monotonic()
+        try:
+            response = await self.client.post(
+                "/api/generate",
+                json={
+                    "model": model,
+                    "prompt": "",
+                    "stream": False,
+                    "keep_alive": KEEP_ALIVE,
+                    "options": {"num_ctx": NUM_CTX},
+                },
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            entry.update(resident=False, error=str(e) or type(e).__name__)
+            logging.warning(f"⚠️ Could not load model {model}: {entry['error']}")
+            return False
+
+        elapsed = time.monotonic() - start_time
+        if not entry["resident"]:
+            entry["load_seconds"] = elapsed
+            logging.info(f"🔥 Model {model} resident after {elapsed:.2f}s")
+        entry.update(resident=True, last_keepalive=time.time(), error=None)
+        return True
+
+    async def refresh_residency(self):
+        """Update ``resident`` from the models Ollama reports as loaded."""
+        try:
+            response = await self.client.get("/api/ps")
+            response.raise_for_status()
+            loaded = set()
+            for entry in response.json().get("models", []):
+                loaded.update((entry.get("name"), entry.get("model")))
+        except (httpx.HTTPError, ValueError) as e:
+            logging.warning(f"⚠️ Could not query loaded models: {str(e)}")
+            return
+
+        for model, entry in self.state.items():
+            if entry["resident"] and model not in loaded:
+                logging.warning(f"⚠️ Model {model} was unloaded by Ollama")
+            entry["resident"] = model in loaded
+
+    async def _run(self):
+        # ✅ Warm-up: retry until every model is resident
+        while not self.ready:
+            await asyncio.gather(*(
+                self.load(model) for model, entry in self.state.items() if not entry["resident"]
+            ))
+            if not self.ready:
+                await asyncio.sleep(WARMUP_RETRY_DELAY)
+
+        # ✅ Keep-alive: re-pin models and reload any that were evicted
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL)
+            await self.refresh_residency()
+            await asyncio.gather(*(self.load(model) for model in self.models))
+
+    def metrics(self) -> dict:
+        return {"ready": self.ready, "models": self.state}
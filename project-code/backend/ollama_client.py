@@ -0,0 +1,224 @@
+import os
+import json
+import asyncio
+import time
+import logging
+import httpx
+from fastapi import HTTPException
+
+# ✅ Ollama Connection Settings (override via environment)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+MODEL_NAME = os.getenv("OLLAMA_MODEL", "deepseek-coder-v2:16b")
+CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "300"))
+MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", "16"))
+KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "60"))
+
+# ✅ Sampling options sent with every generation (JSON object, e.g. '{"temperature": 0.2}')
+GENERATION_OPTIONS = json.loads(os.getenv("OLLAMA_OPTIONS", "{}"))
+
+# ✅ Model residency and prompt-prefix reuse
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# One context window for every call (warm-up, priming, generation): Ollama reloads the runner when num_ctx changes
+NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", GENERATION_OPTIONS.get("num_ctx", 16384)))
+# "system": send instructions as a stable system prompt so the runner reuses its KV prefix
+# "context": evaluate the instructions once and pass the returned context on every call
+PROMPT_REUSE_MODE = os.getenv("OLLAMA_PROMPT_REUSE", "system")
+
+# ✅ Structured output: "schema" (JSON schema, Ollama >= 0.5), "json" (any JSON) or "none"
+OUTPUT_FORMAT = os.getenv("OLLAMA_OUTPUT_FORMAT", "schema")
+FILES_SCHEMA = {
+    "type": "object",
+    "properties": {"files": {"type": "object", "additionalProperties": {"type": "string"}, "minProperties": 1}},
+    "required": ["files"],
+}
+# Formats to try, strongest first; a backend that rejects one falls back to the next
+OUTPUT_FORMATS = {"schema": [FILES_SCHEMA, "json", None], "json": ["json", None], "none": [None]}
+
+
+class OutputFormatUnsupported(HTTPException):
+    """The backend rejected the requested ``format`` (too old for structured output)."""
+
+    def __init__(self, detail: str):
+        super().__init__(status_code=400, detail=detail)
+
+
+def format_name(output_format) -> str:
+    if output_format is None:
+        return "none"
+    return "json" if output_format == "json" else "schema"
+
+
+# ✅ **Shared Async HTTP Client**
+def create_http_client(base_url: str = OLLAMA_BASE_URL) -> httpx.AsyncClient:
+    """Create a pooled keep-alive client for one Ollama host."""
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+# ✅ **Stream AI Tokens (Ollama NDJSON)**
+async def stream_ai_tokens(
+    client: httpx.AsyncClient,
+    prompt: str,
+    stats: dict = None,
+    system: str = None,
+    context: list = None,
+    options: dict = None,
+    output_format=None,
+):
+    """Yield response tokens from Ollama's NDJSON stream as they arrive.
+
+    The upstream response is closed as soon as the consumer stops iterating or
+    its task is cancelled. Timing and token counts are written into ``stats``.
+    ``system`` is sent as the system prompt; ``context`` continues from a
+    previously evaluated prefix instead. ``options`` override
+    GENERATION_OPTIONS for this request. ``output_format`` is sent as
+    Ollama's ``format`` (``"json"`` or a JSON schema); a backend that rejects
+    it raises OutputFormatUnsupported before any token is yielded.
+    """
+    stats = stats if stats is not None else {}
+    start_time = time.monotonic()
+    stats.update(start_time=start_time, time_to_first_token=None, token_count=0)
+
+    payload = {
+        "model": MODEL_NAME,
+        "prompt": prompt,
+        "stream": True,
+        "keep_alive": KEEP_ALIVE,
+        "options": {**GENERATION_OPTIONS, **(options or {})},
+    }
+    if context:
+        payload["context"] = context
+    elif system:
+        payload["system"] = system
+    if output_format is not None:
+        payload["format"] = output_format
+
+    try:
+        async with client.stream("POST", "/api/generate", json=payload) as response:
+            if response.status_code == 400 and output_format is not None:
+                body = (await response.aread()).decode("utf-8", "replace")
+                logging.warning(f"⚠️ Backend rejected format={format_name(output_format)}: {body[:200]}")
+                raise OutputFormatUnsupported(body[:200] or "format not supported")
+            if response.status_code != 200:
+                logging.error(f"❌ AI Model Error: {response.status_code}")
+                raise HTTPException(status_code=500, detail="AI failed to generate code.")
+
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    logging.error(f"❌ AI Model Error: {chunk['error']}")
+                    raise HTTPException(status_code=500, detail="AI failed to generate code.")
+
+                token = chunk.get("response", "")
+                if token:
+                    if stats["time_to_first_token"] is None:
+                        stats["time_to_first_token"] = time.monotonic() - start_time
+                        logging.info(f"⚡ Time to first token: {stats['time_to_first_token']:.2f}s")
+                    stats["token_count"] += 1
+                    yield token
+
+                if chunk.get("done"):
+                    stats["done_reason"] = chunk.get("done_reason", "stop")
+                    stats["duration"] = time.monotonic() - start_time
+                    stats["prompt_eval_count"] = chunk.get("prompt_eval_count")
+                    stats["eval_count"] = chunk.get("eval_count")
+                    stats["prompt_eval_seconds"] = chunk.get("prompt_eval_duration", 0) / 1e9
+                    logging.info(
+                        f"🏁 AI stream finished: {stats['token_count']} tokens in "
+                        f"{stats['duration']:.2f}s (done_reason={stats['done_reason']}, "
+                        f"prompt_eval={stats['prompt_eval_count']} tokens/{stats['prompt_eval_seconds']:.2f}s)"
+                    )
+                    return
+
+    except httpx.TimeoutException as e:
+        logging.error(f"❌ AI Model Timeout: {type(e).__name__}")
+        raise HTTPException(status_code=504, detail="AI model timed out.")
+    except httpx.TransportError as e:
+        logging.error(f"❌ AI Model Connection Error: {str(e)}")
+        raise HTTPException(status_code=502, detail="AI model is unreachable.")
+
+    logging.warning("⚠️ AI stream closed before 'done' was received.")
+
+
+# ✅ **Model Digest (identifies the exact weights for caching)**
+async def fetch_model_digest(client: httpx.AsyncClient, model: str = MODEL_NAME) -> str:
+    """Return the digest of ``model`` from /api/tags, or "unknown" if unavailable."""
+    try:
+        response = await client.get("/api/tags")
+        response.raise_for_status()
+        for entry in response.json().get("models", []):
+            if model in (entry.get("name"), entry.get("model")):
+                return entry.get("digest", "unknown")
+        logging.warning(f"⚠️ Model {model} not listed by Ollama; caching without digest.")
+    except (httpx.HTTPError, ValueError) as e:
+        logging.warning(f"⚠️ Could not fetch model digest: {str(e)}")
+    return "unknown"
+
+
+# ✅ **Evaluated Prompt Prefix (context mode)**
+class PromptPrefixCache:
+    """Evaluate a static system prompt once and reuse its returned ``context``.
+
+    Contexts are kept per host, since each one holds its own KV cache.
+    Backends that reject or ignore ``context`` fall back to sending the
+    system prompt with every request.
+    """
+
+    def __init__(self):
+        self.contexts = {}
+        self.unsupported = False
+        self._lock = asyncio.Lock()
+
+    async def get(self, client: httpx.AsyncClient, system: str):
+        """Return the context for ``system``, priming it on first use."""
+        if PROMPT_REUSE_MODE != "context" or self.unsupported:
+            return None
+
+        key = (str(client.base_url), MODEL_NAME, system)
+        if key in self.contexts:
+            return self.contexts[key]
+
+        async with self._lock:
+            if key in self.contexts:
+                return self.contexts[key]
+            try:
+                response = await client.post(
+                    "/api/generate",
+                    json={
+                        "model": MODEL_NAME,
+                        "system": system,
+                        "prompt": "Acknowledge with OK.",
+                        "stream": False,
+                        "keep_alive": KEEP_ALIVE,
+                        "options": {**GENERATION_OPTIONS, "num_ctx": NUM_CTX, "num_predict": 1},
+                    },
+                )
+                response.raise_for_status()
+                context = response.json().get("context")
+            except (httpx.HTTPError, ValueError) as e:
+                logging.warning(f"⚠️ Could not prime prompt prefix, sending system prompt instead: {str(e)}")
+                return None
+
+            if not context:
+                logging.warning("⚠️ Backend returned no context; prompt prefix reuse disabled.")
+                self.unsupported = True
+                return None
+
+            logging.info(f"🧠 Prompt prefix evaluated once ({len(context)} context tokens)")
+            self.contexts[key] = context
+            return context
+
+    def invalidate(self):
+        self.contexts.clear()
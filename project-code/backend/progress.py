@@ -0,0 +1,84 @@
+import json
+import time
+import asyncio
+
+# ✅ Minimum seconds between "tokens" events sent to clients
+TOKEN_EVENT_INTERVAL = 0.5
+
+
+# ✅ **Progress Channel for a Generation**
+class ProgressChannel:
+    """Fan out progress events for one generation to any number of listeners.
+
+    Events are kept in ``history`` so a listener that subscribes late still
+    receives everything from the start. ``close()`` ends every subscription.
+    """
+
+    def __init__(self):
+        self.history = []
+        self.subscribers = set()
+        self.closed = False
+        self._last_token_event = 0.0
+
+    def emit(self, event: str, **data):
+        """Publish an event to every subscriber."""
+        if self.closed:
+            return
+        payload = {"event": event, "time": time.time(), **data}
+        self.history.append(payload)
+        for queue in self.subscribers:
+            queue.put_nowait(payload)
+
+    def stage(self, name: str, **data):
+        self.emit("stage", stage=name, **data)
+
+    def tokens(self, stats: dict, force: bool = False):
+        """Publish token count and throughput, throttled to TOKEN_EVENT_INTERVAL."""
+        now = time.monotonic()
+        if not force and now - self._last_token_event < TOKEN_EVENT_INTERVAL:
+            return
+        self._last_token_event = now
+
+        elapsed = now - stats.get("start_time", now)
+        first_token = stats.get("time_to_first_token")
+        generating_for = elapsed - first_token if first_token is not None else 0
+        token_count = stats.get("token_count", 0)
+        # ✅ Throughput counts tokens produced after the first one arrived
+        tokens_per_sec = (token_count - 1) / generating_for if token_count > 1 and generating_for > 0 else 0.0
+        self.emit(
+            "tokens",
+            token_count=token_count,
+            tokens_per_sec=round(tokens_per_sec, 2),
+            time_to_first_token=first_token,
+        )
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for queue in self.subscribers:
+            queue.put_nowait(None)
+
+    async def subscribe(self):
+        """Yield past and future events until the channel is closed."""
+        queue = asyncio.Queue()
+        for payload in self.history:
+            queue.put_nowait(payload)
+        if self.closed:
+            queue.put_nowait(None)
+        self.subscribers.add(queue)
+
+        try:
+            while True:
+                payload = await queue.get()
+                if payload is None:
+                    return
+                yield payload
+        finally:
+            self.subscribers.discard(queue)
+
+
+# ✅ **Server-Sent Events Formatting**
+def format_sse(payload: dict) -> str:
+    """Serialize one progress event as an SSE message."""
+    return f"event: {payload['event']}\ndata: {json.dumps(payload)}\n\n"
@@ -0,0 +1,233 @@
+import re
+import json
+import math
+import hashlib
+import logging
+import textwrap
+from sizing import DEFAULT_CHARS_PER_TOKEN
+
+_EMPHASIS = re.compile(r"\*\*(.+?)\*\*")
+_BLANK_RUNS = re.compile(r"\n{3,}")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / DEFAULT_CHARS_PER_TOKEN)
+
+
+def _compact_json_blocks(text: str) -> str:
+    """Re-serialize pretty-printed JSON examples onto a single line."""
+    decoder = json.JSONDecoder()
+    out, index = [], 0
+    while True:
+        start = text.find("\n{", index)
+        if start == -1:
+            break
+        try:
+            value, end = decoder.raw_decode(text, start + 1)
+        except ValueError:
+            out.append(text[index:start + 2])
+            index = start + 2
+            continue
+        out.append(text[index:start + 1])
+        out.append(json.dumps(value, ensure_ascii=False))
+        index = end
+    out.append(text[index:])
+    return "".join(out)
+
+
+def compile_text(text: str) -> str:
+    """Strip indentation, markdown emphasis, trailing spaces and blank runs."""
+    text = textwrap.dedent(text)
+    text = _EMPHASIS.sub(r"\1", text)
+    text = "\n".join(line.rstrip() for line in text.splitlines())
+    text = _compact_json_blocks(text)
+    return _BLANK_RUNS.sub("\n\n", text).strip() + "\n"
+
+
+# ✅ **Compiled Prompt Template**
+class PromptTemplate:
+    """A system prompt plus a per-request user template, compiled once.
+
+    ``version`` combines the hand-maintained ``revision`` with a hash of the
+    compiled text, so any edit shows up in metrics and logs even if the
+    revision is not bumped. The static prefix's token estimate is computed
+    once here; only ``render()`` output is counted per request.
+    """
+
+    def __init__(self, name: str, revision: int, system: str, user: str):
+        self.name = name
+        self.revision = revision
+        self.system = compile_text(system)
+        self.user = compile_text(user)
+        digest = hashlib.sha256(f"{self.system}\0{self.user}".encode("utf-8")).hexdigest()
+        self.version = f"{name}-r{revision}-{digest[:8]}"
+        self.static_tokens = estimate_tokens(self.system)
+        self.requests = 0
+        self.prompt_tokens_total = 0
+        self.prompt_eval_total = 0
+
+    def render(self, **fields) -> str:
+        return self.user.format(**fields)
+
+    def count(self, prompt: str) -> dict:
+        """Estimated prompt tokens for one request built from this template."""
+        dynamic = estimate_tokens(prompt)
+        return {
+            "template": self.version,
+            "static_tokens": self.static_tokens,
+            "dynamic_tokens": dynamic,
+            "prompt_tokens": self.static_tokens + dynamic,
+        }
+
+    def record(self, counts: dict, stats: dict):
+        """Account one finished request; ``stats`` come from the token stream."""
+        self.requests += 1
+        self.prompt_tokens_total += counts["prompt_tokens"]
+        self.prompt_eval_total += stats.get("prompt_eval_count") or 0
+        logging.info(
+            f"🧾 Prompt {self.version}: ~{counts['prompt_tokens']} tokens "
+            f"(static {counts['static_tokens']}, dynamic {counts['dynamic_tokens']}), "
+            f"evaluated {stats.get('prompt_eval_count')}"
+        )
+
+    def metrics(self) -> dict:
+        return {
+            "version": self.version,
+            "static_tokens": self.static_tokens,
+            "requests": self.requests,
+            "avg_prompt_tokens": round(self.prompt_tokens_total / self.requests, 1) if self.requests else None,
+            "avg_prompt_eval_count": round(self.prompt_eval_total / self.requests, 1) if self.requests else None,
+        }
+
+
+# ✅ **Single-Call Generation**
+GENERATE = PromptTemplate(
+    "generate",
+    revision=2,
+    system="""
+        **INSTRUCTIONS FOR AI MODEL:**
+        - Return JSON ONLY, do NOT include any explanations.
+        - Do NOT include markdown like ```json.
+        - Ensure the JSON includes all required React files.
+
+        **Expected JSON Output:**
+        {
+            "files": {
+                "src/App.js": "... React App.js code ...",
+                "src/index.js": "... ReactDOM code ...",
+                "src/components/Dashboard.js": "... Dashboard component ...",
+                "src/components/Dashboard.css": "... Dashboard styles ...",
+                "src/components/Navbar.js": "... Navigation bar ...",
+                "src/components/Navbar.css": "... Navbar styles ...",
+                "src/utils/auth.js": "... Logout handling ...",
+                "package.json": "... dependencies ...",
+                "public/index.html": "... main HTML file ..."
+            }
+        }
+    """,
+    user="""
+        **User Story:**
+        {user_story}
+    """,
+)
+
+# ✅ **Fan-out Mode: Planning and Per-File Instructions**
+PLAN = PromptTemplate(
+    "plan",
+    revision=2,
+    system="""
+        **INSTRUCTIONS FOR AI MODEL:**
+        - Plan the React project for the user story. Do NOT write any code.
+        - Return JSON ONLY, do NOT include any explanations.
+        - Map every file path to ONE line describing its purpose and the exports/props other files rely on.
+        - Always include src/App.js, src/index.js, package.json and public/index.html.
+
+        **Expected JSON Output:**
+        {
+            "files": {
+                "src/App.js": "Router with routes / (Login) and /dashboard (Dashboard)",
+                "src/components/Login.js": "default export Login; calls login() from utils/auth",
+                "src/utils/auth.js": "exports login(email, password) and logout()"
+            }
+        }
+    """,
+    user=GENERATE.user,
+)
+
+FILE = PromptTemplate(
+    "file",
+    revision=2,
+    system="""
+        **INSTRUCTIONS FOR AI MODEL:**
+        - Write the complete contents of ONE file of a React project.
+        - Follow the project plan so imports and exports match the other files.
+        - Return JSON ONLY, do NOT include any explanations or markdown.
+
+        **Expected JSON Output:**
+        {
+            "files": {
+                "<requested path>": "... complete file contents ..."
+            }
+        }
+    """,
+    user="""
+        **User Story:**
+        {user_story}
+
+        **Project Plan:**
+        {plan}
+
+        **Generate ONLY the file `{filepath}`.**
+    """,
+)
+
+# ✅ **Targeted Regeneration of Missing or Broken Files**
+REGENERATE = PromptTemplate(
+    "regenerate",
+    revision=1,
+    system="""
+        **INSTRUCTIONS FOR AI MODEL:**
+        - Some files of a React project are missing. Write the complete contents of ONLY the requested files.
+        - Keep imports and exports consistent with the existing files.
+        - Return JSON ONLY, do NOT include any explanations or markdown.
+
+        **Expected JSON Output:**
+        {
+            "files": {
+                "<requested path>": "... complete file contents ..."
+            }
+        }
+    """,
+    user="""
+        **User Story:**
+        {user_story}
+
+        **Existing Files:**
+        {existing}
+
+        **Regenerate ONLY these files:**
+        {requested}
+    """,
+)
+
+# ✅ **Continuation of a Truncated Answer**
+CONTINUE = PromptTemplate(
+    "continue",
+    revision=1,
+    system="""
+        **INSTRUCTIONS FOR AI MODEL:**
+        - Your previous answer was cut off before its JSON was complete.
+        - Output ONLY the text that comes after the last character of the partial answer.
+        - Do NOT repeat the partial answer and do NOT start a new JSON object.
+        - Do NOT include explanations or markdown.
+    """,
+    user="""
+        **Original Instructions:**
+        {instructions}
+        {prompt}
+        **Partial Answer:**
+        {partial}
+    """,
+)
+
+TEMPLATES = {template.name: template for template in (GENERATE, PLAN, FILE, REGENERATE, CONTINUE)}
@@ -0,0 +1,276 @@
+import os
+import re
+import json
+import shutil
+import difflib
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+STAGING_SUFFIX = ".staging"
+PUBLISH_SUFFIX = ".publish"
+MANIFEST_FILE = "manifest.json"
+_RELEASE_ID = re.compile(r"\d{8}-\d{6}-\d{6}")
+
+
+def _resolve(base: str, filepath: str) -> str:
+    """Join ``filepath`` under ``base``, refusing paths that escape it."""
+    full_path = os.path.normpath(os.path.join(base, filepath))
+    if os.path.commonpath([base, full_path]) != base or full_path == base:
+        raise ValueError(f"Refusing to write outside the project: {filepath}")
+    return full_path
+
+
+def _hash_file(path: str):
+    """sha256 of a file's bytes, or None if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _live_digest(path: str, entry) -> str:
+    """sha256 of a live file, reusing the manifest ``entry`` only while its size and mtime match."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if isinstance(entry, dict) and (entry.get("size"), entry.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns):
+        return entry["sha256"]
+    return _hash_file(path)  # edited since the last publish, or an old manifest
+
+
+def _line_changes(old_path: str, new_path: str) -> dict:
+    """Lines added and removed between two text files."""
+    with open(old_path, "r", encoding="utf-8", errors="replace") as f:
+        old_lines = f.readlines()
+    with open(new_path, "r", encoding="utf-8", errors="replace") as f:
+        new_lines = f.readlines()
+    added = removed = 0
+    for line in difflib.unified_diff(old_lines, new_lines, n=0):
+        if line.startswith("+") and not line.startswith("+++"):
+            added += 1
+        elif line.startswith("-") and not line.startswith("---"):
+            removed += 1
+    return {"added": added, "removed": removed}
+
+
+def _walk_files(root: str) -> list:
+    """Paths of all files under ``root``, relative to it."""
+    found = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            found.append(os.path.relpath(os.path.join(dirpath, filename), root))
+    return sorted(found)
+
+
+# ✅ **Staged Releases of the Generated Project**
+class ProjectReleases:
+    """Stage each generation beside the live project, then publish it at once.
+
+    Files are written to ``<root>/<id>.staging`` while the model streams, so
+    the dev server never sees a half-written project. ``publish()`` renames
+    the staging directory to ``<root>/<id>`` (a complete snapshot, kept for
+    rollback), copies the snapshot next to the project on the same
+    filesystem, and then moves every file into place with ``os.replace``
+    in one burst: each file changes atomically and the watcher sees a single
+    batch of changes instead of one per file. The project directory itself is
+    never swapped, because a running dev server keeps watching the directory
+    it was started in.
+
+    ``<root>/manifest.json`` records the content hash, size and mtime of every
+    published file; a live file whose size or mtime no longer matches (edited
+    by hand) is rehashed. Files whose hash is unchanged are not touched (no mtime bump, no
+    rebuild), and files the previous release published but the new one lacks
+    are deleted, unless the new result is incomplete: then the previous
+    versions are carried into the new release instead. Files the manifest
+    does not know about, such as ``node_modules`` or ``package-lock.json``,
+    are never deleted.
+    """
+
+    def __init__(self, project_dir: str, keep: int = 5):
+        self.project_dir = os.path.abspath(project_dir)
+        self.root = os.path.join(os.path.dirname(self.project_dir), ".releases")
+        self.keep = keep
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+        # ✅ Drop staging and publish directories left behind by a crash
+        for name in os.listdir(self.root):
+            if name.endswith((STAGING_SUFFIX, PUBLISH_SUFFIX)):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def _path(self, release_id: str, suffix: str = "") -> str:
+        return os.path.join(self.root, f"{release_id}{suffix}")
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.root, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"release": None, "files": {}}
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ Ignoring unreadable release manifest: {str(e)}")
+            return {"release": None, "files": {}}
+
+    def _save_manifest(self, release_id: str, hashes: dict):
+        files = {}
+        for filepath, digest in hashes.items():
+            stat = os.stat(_resolve(self.project_dir, filepath))
+            files[filepath] = {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        manifest = os.path.join(self.root, MANIFEST_FILE)
+        with open(f"{manifest}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"release": release_id, "files": files}, f, indent=2, sort_keys=True)
+        os.replace(f"{manifest}.tmp", manifest)
+
+    def current(self):
+        return self._load_manifest()["release"]
+
+    def create(self) -> str:
+        """Start a new, empty staged release and return its id."""
+        release_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        os.makedirs(self._path(release_id, STAGING_SUFFIX))
+        return release_id
+
+    def write(self, release_id: str, filepath: str, content: str):
+        """Write one file into a release's staging directory. Blocking."""
+        full_path = _resolve(self._path(release_id, STAGING_SUFFIX), filepath)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def discard(self, release_id: str):
+        """Throw away a release that will not be published."""
+        shutil.rmtree(self._path(release_id, STAGING_SUFFIX), ignore_errors=True)
+
+    def publish(self, release_id: str, paths: list = None, complete: bool = True) -> dict:
+        """Seal a staged release and make it live. Blocking.
+
+        With ``paths``, staged files outside it (left by an attempt that was
+        aborted and retried) are dropped first, so the release holds exactly
+        the files of the final result. With ``complete=False`` (some files
+        could not be generated), every file of the current release that the
+        result lacks is kept, so nothing is deleted. An empty release is
+        refused with ValueError.
+        """
+        staging = self._path(release_id, STAGING_SUFFIX)
+        if paths is not None:
+            keep = {os.path.relpath(_resolve(staging, filepath), staging) for filepath in paths}
+            for filepath in _walk_files(staging):
+                if filepath not in keep:
+                    logging.info(f"🧹 Dropping stale staged file {filepath} ({release_id})")
+                    os.remove(os.path.join(staging, filepath))
+        with self._lock:
+            if not complete:
+                self._carry_over(staging)
+            if not _walk_files(staging):
+                raise ValueError(f"Refusing to publish release {release_id} without files")
+            os.replace(staging, self._path(release_id))
+            return self._publish(release_id)
+
+    def _carry_over(self, staging: str):
+        """Copy files of the current release that ``staging`` lacks into it."""
+        previous = self.current()
+        staged = set(_walk_files(staging))
+        for filepath in self._load_manifest()["files"]:
+            if filepath in staged:
+                continue
+            source = os.path.join(self._path(previous), filepath) if previous else None
+            if not source or not os.path.exists(source):
+                source = _resolve(self.project_dir, filepath)  # snapshot pruned: keep the live copy
+            if os.path.exists(source):
+                logging.info(f"📎 Keeping previous version of {filepath}")
+                os.makedirs(os.path.dirname(os.path.join(staging, filepath)), exist_ok=True)
+                shutil.copyfile(source, os.path.join(staging, filepath))
+
+    def restore(self, release_id: str) -> dict:
+        """Make an earlier release live again. Raises KeyError if it is gone."""
+        with self._lock:
+            # ✅ Only sealed releases; never "..", "." or a staging directory
+            if release_id not in {release["id"] for release in self.releases()}:
+                raise KeyError(release_id)
+            return self._publish(release_id)
+
+    def _publish(self, release_id: str) -> dict:
+        snapshot = self._path(release_id)
+        hashes = {filepath: _hash_file(os.path.join(snapshot, filepath)) for filepath in _walk_files(snapshot)}
+        published = self._load_manifest()["files"]
+
+        # ✅ Compare against the live files, skipping the rehash where the manifest's stat still matches
+        added, changed, unchanged = [], {}, []
+        for filepath, digest in hashes.items():
+            target = _resolve(self.project_dir, filepath)
+            live = _live_digest(target, published.get(filepath))
+            if live == digest:
+                unchanged.append(filepath)
+            elif live is None:
+                added.append(filepath)
+            else:
+                changed[filepath] = _line_changes(target, os.path.join(snapshot, filepath))
+        deleted = sorted(filepath for filepath in published if filepath not in hashes)
+        to_write = added + list(changed)
+
+        # ✅ Copy first (the slow part) into a sibling directory on the same filesystem...
+        pending = self._path(release_id, PUBLISH_SUFFIX)
+        shutil.rmtree(pending, ignore_errors=True)
+        try:
+            for filepath in to_write:
+                os.makedirs(os.path.dirname(os.path.join(pending, filepath)), exist_ok=True)
+                shutil.copyfile(os.path.join(snapshot, filepath), os.path.join(pending, filepath))
+            # ✅ ...then flip the changed files into the live project in one burst of renames
+            for filepath in to_write:
+                target = _resolve(self.project_dir, filepath)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(os.path.join(pending, filepath), target)
+            for filepath in deleted:
+                self._remove_live(filepath)
+        finally:
+            shutil.rmtree(pending, ignore_errors=True)
+
+        self._save_manifest(release_id, hashes)
+        self._prune()
+        logging.info(
+            f"🚀 Published release {release_id}: {len(added)} added, {len(changed)} changed, "
+            f"{len(unchanged)} unchanged, {len(deleted)} deleted"
+        )
+        return {
+            "release": release_id,
+            "files": sorted(hashes),
+            "added": added,
+            "changed": changed,
+            "unchanged": len(unchanged),
+            "deleted": deleted,
+        }
+
+    def _remove_live(self, filepath: str):
+        """Delete a file the new release dropped, and any directories it leaves empty."""
+        target = _resolve(self.project_dir, filepath)
+        try:
+            os.remove(target)
+        except FileNotFoundError:
+            pass
+        directory = os.path.dirname(target)
+        while directory != self.project_dir:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break  # not empty
+            directory = os.path.dirname(directory)
+
+    def releases(self) -> list:
+        """Published releases, newest first."""
+        current = self.current()
+        return [
+            {"id": name, "files": len(_walk_files(self._path(name))), "current": name == current}
+            for name in sorted(os.listdir(self.root), reverse=True)
+            if _RELEASE_ID.fullmatch(name) and os.path.isdir(self._path(name))
+        ]
+
+    def _prune(self):
+        current = self.current()
+        published = [release["id"] for release in self.releases()]
+        for release_id in published[self.keep:]:
+            if release_id != current:
+                shutil.rmtree(self._path(release_id), ignore_errors=True)
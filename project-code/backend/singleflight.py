@@ -0,0 +1,56 @@
+import asyncio
+import logging
+from progress import ProgressChannel
+
+
+# ✅ **One In-Flight Generation**
+class Flight:
+    """A running generation shared by every request with the same key."""
+
+    def __init__(self, key: str, task: asyncio.Task, progress: ProgressChannel):
+        self.key = key
+        self.task = task
+        self.progress = progress
+        self.waiters = 0
+
+
+# ✅ **Single-Flight Coalescing of Identical Requests**
+class SingleFlight:
+    """Run at most one generation per key; duplicates attach to the running one.
+
+    Callers ``attach()`` to get the shared :class:`Flight`, await
+    ``asyncio.shield(flight.task)`` for the result or subscribe to
+    ``flight.progress``, then ``detach()``. The generation is cancelled only
+    when its last waiter detaches before it finishes.
+    """
+
+    def __init__(self):
+        self.flights = {}
+
+    def attach(self, key: str, start) -> Flight:
+        """Join the flight for ``key``, starting ``start(progress)`` if none is running."""
+        flight = self.flights.get(key)
+        if flight is None:
+            progress = ProgressChannel()
+            task = asyncio.create_task(start(progress))
+            flight = Flight(key, task, progress)
+            self.flights[key] = flight
+            task.add_done_callback(lambda t: self._finished(flight))
+        else:
+            logging.info(f"🔗 Coalesced duplicate request onto in-flight generation ({key[:12]})")
+
+        flight.waiters += 1
+        return flight
+
+    def detach(self, flight: Flight):
+        flight.waiters -= 1
+        if flight.waiters <= 0 and not flight.task.done():
+            logging.info(f"🛑 Last client left, cancelling generation ({flight.key[:12]})")
+            flight.task.cancel()
+
+    def _finished(self, flight: Flight):
+        if self.flights.get(flight.key) is flight:
+            del self.flights[flight.key]
+        # ✅ Mark the exception retrieved; waiters already saw it via shield()
+        if not flight.task.cancelled():
+            flight.task.exception()
@@ -0,0 +1,100 @@
+import os
+import math
+import logging
+from collections import deque
+
+# ✅ Sizing Bounds
+MIN_NUM_PREDICT = 256
+MAX_NUM_PREDICT = int(os.getenv("OLLAMA_MAX_NUM_PREDICT", "8192"))
+OUTPUT_HEADROOM = 1.5         # num_predict = expected output * headroom
+DEFAULT_CHARS_PER_TOKEN = 3.5
+DEFAULT_TOKENS_PER_FILE = 600
+DEFAULT_FILE_COUNT = 9        # files listed in the example schema
+HISTORY = 200
+
+
+def _mean(values, default):
+    return sum(values) / len(values) if values else default
+
+
+def _p90(values, default):
+    if not values:
+        return default
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))]
+
+
+# ✅ **Adaptive num_predict**
+class SizingEngine:
+    """Size each request's output budget from history.
+
+    ``num_ctx`` is pinned: Ollama reloads the model runner whenever it
+    changes, so every request runs in the same context window and only
+    ``num_predict`` adapts, capped to what fits beside the prompt.
+    Prompt tokens are counted by the caller (see ``prompts.PromptTemplate``).
+    Expected output is the file count (from
+    the plan, or history) times the p90 tokens per file, or the size of a
+    similar story's result when one is known. Each finished generation
+    records its actual output so the estimates converge.
+    """
+
+    def __init__(self, num_ctx: int):
+        self.num_ctx = num_ctx
+        self.chars_per_token = deque(maxlen=HISTORY)
+        self.tokens_per_file = {}
+        self.file_counts = {}
+        self.errors = {}
+        self.truncations = 0
+
+    def tokens_for_chars(self, chars: int) -> int:
+        return math.ceil(chars / _mean(self.chars_per_token, DEFAULT_CHARS_PER_TOKEN))
+
+    def predict_for(self, prompt_tokens: int, num_predict: int) -> int:
+        """``num_predict``, lowered so the prompt and output fit in the pinned ``num_ctx``."""
+        return max(MIN_NUM_PREDICT, min(num_predict, self.num_ctx - prompt_tokens))
+
+    def size(self, kind: str, prompt_tokens: int, expected_files: int = None, similar_output_chars: int = None) -> dict:
+        """Return ``num_ctx``/``num_predict`` options plus the estimate used."""
+
+        if similar_output_chars:
+            expected_output = self.tokens_for_chars(similar_output_chars)
+        else:
+            files = expected_files or round(_mean(self.file_counts.get(kind, ()), DEFAULT_FILE_COUNT))
+            expected_output = math.ceil(files * _p90(self.tokens_per_file.get(kind, ()), DEFAULT_TOKENS_PER_FILE))
+
+        num_predict = min(MAX_NUM_PREDICT, max(MIN_NUM_PREDICT, math.ceil(expected_output * OUTPUT_HEADROOM)))
+        return {
+            "num_ctx": self.num_ctx,
+            "num_predict": self.predict_for(prompt_tokens, num_predict),
+            "estimated_prompt_tokens": prompt_tokens,
+            "estimated_output_tokens": expected_output,
+        }
+
+    def record(self, kind: str, sizing: dict, stats: dict, output_chars: int, file_count: int):
+        """Learn from a finished generation and log the estimation error."""
+        actual = stats.get("eval_count") or stats.get("token_count")
+        if not actual:
+            return
+
+        self.chars_per_token.append(output_chars / actual)
+        if file_count:
+            self.tokens_per_file.setdefault(kind, deque(maxlen=HISTORY)).append(actual / file_count)
+            self.file_counts.setdefault(kind, deque(maxlen=HISTORY)).append(file_count)
+
+        error = (sizing["estimated_output_tokens"] - actual) / actual
+        self.errors.setdefault(kind, deque(maxlen=HISTORY)).append(error)
+        if stats.get("done_reason") == "length" or stats.get("continuations"):
+            self.truncations += 1
+            logging.warning(f"✂️ Output hit num_predict={sizing['num_predict']} ({kind})")
+        logging.info(
+            f"📏 Sizing ({kind}): estimated {sizing['estimated_output_tokens']} output tokens, "
+            f"actual {actual} ({error:+.0%}), num_ctx={sizing['num_ctx']}"
+        )
+
+    def metrics(self) -> dict:
+        return {
+            "chars_per_token": round(_mean(self.chars_per_token, DEFAULT_CHARS_PER_TOKEN), 3),
+            "tokens_per_file_p90": {k: _p90(v, DEFAULT_TOKENS_PER_FILE) for k, v in self.tokens_per_file.items()},
+            "mean_abs_error": {k: round(_mean([abs(e) for e in v], 0), 3) for k, v in self.errors.items()},
+            "truncations": self.truncations,
+        }
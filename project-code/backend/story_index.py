@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import hashlib
+import operator
+import logging
+import threading
+import unicodedata
+
+_WORD = re.compile(r"\w+")
+SIGNATURE_SCHEME = "oph-1"  # persisted with each entry; entries of another scheme are not comparable
+
+
+# ✅ **Story Shingling**
+def shingle_story(text: str, size: int = 3) -> set:
+    """Word ``size``-grams of a story, ignoring case, punctuation and emoji."""
+    words = _WORD.findall(unicodedata.normalize("NFKC", text).lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+# ✅ **MinHash / LSH Index of Past Stories**
+class StoryIndex:
+    """Locality-sensitive index mapping user stories to their cached results.
+
+    Each story is reduced to a MinHash signature of ``bands * rows`` values
+    by one-permutation hashing: every shingle is hashed once and kept as the
+    minimum of the bin its hash falls in, and empty bins borrow from the next
+    filled one. Stories sharing any band are candidates, and the fraction of
+    equal signature values estimates their Jaccard similarity. Entries point
+    at a generation cache key rather than holding files, and are appended to
+    a JSON-lines file so the index survives restarts. Each entry also records
+    the cache namespace it was generated in; a query only matches entries
+    of its own namespace, so new weights or templates never get old results.
+    """
+
+    def __init__(self, path: str = None, bands: int = 16, rows: int = 4, shingle_size: int = 3):
+        self.path = path
+        self.bands = bands
+        self.rows = rows
+        self.shingle_size = shingle_size
+        self.entries = {}                        # cache_key -> signature
+        self.namespaces = {}                     # cache_key -> cache namespace
+        self.buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self._bins = bands * rows
+
+        if path:
+            self._load()
+
+    def signature(self, text: str):
+        shingles = shingle_story(text, self.shingle_size)
+        if not shingles:
+            return None
+        bins = [None] * self._bins
+        for shingle in shingles:
+            value, slot = divmod(_hash64(shingle), self._bins)
+            if bins[slot] is None or value < bins[slot]:
+                bins[slot] = value
+
+        # ✅ Densify: an empty bin takes the next filled bin's value, offset by the distance
+        signature = list(bins)
+        last, distance = None, 0
+        for i in range(2 * self._bins - 1, -1, -1):
+            value = bins[i % self._bins]
+            if value is not None:
+                last, distance = value, 0
+            else:
+                distance += 1
+                if i < self._bins:
+                    signature[i] = last + (distance << 64)
+        return tuple(signature)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, hash(signature[band * self.rows:(band + 1) * self.rows])
+
+    def _insert(self, cache_key: str, signature, namespace: str):
+        self.entries[cache_key] = signature
+        self.namespaces[cache_key] = namespace
+        for band, key in self._band_keys(signature):
+            self.buckets[band].setdefault(key, []).append(cache_key)
+
+    def add(self, text: str, cache_key: str, namespace: str):
+        """Index ``text`` as having produced the cache entry ``cache_key`` in ``namespace``."""
+        signature = self.signature(text)
+        if signature is None:
+            return
+        with self._lock:
+            if cache_key in self.entries:
+                return
+            self._insert(cache_key, signature, namespace)
+
+        if self.path:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    entry = {"key": cache_key, "ns": namespace, "scheme": SIGNATURE_SCHEME, "sig": signature}
+                    f.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                logging.warning(f"⚠️ Could not persist story index entry: {str(e)}")
+
+    def remove(self, cache_key: str):
+        """Forget an entry whose cached result no longer exists (in memory only)."""
+        with self._lock:
+            signature = self.entries.pop(cache_key, None)
+            if signature is None:
+                return
+            del self.namespaces[cache_key]
+            for band, key in self._band_keys(signature):
+                bucket = self.buckets[band].get(key, [])
+                if cache_key in bucket:
+                    bucket.remove(cache_key)
+
+    def query(self, text: str, namespace: str):
+        """Return ``(cache_key, similarity)`` of the most similar story in ``namespace``, or None."""
+        signature = self.signature(text)
+        if signature is None:
+            return None
+
+        with self._lock:
+            candidates = set()
+            for band, key in self._band_keys(signature):
+                candidates.update(self.buckets[band].get(key, ()))
+
+            best = None
+            for cache_key in candidates:
+                if self.namespaces[cache_key] != namespace:
+                    continue
+                other = self.entries[cache_key]
+                similarity = sum(map(operator.eq, signature, other)) / len(signature)
+                if best is None or similarity > best[1]:
+                    best = (cache_key, similarity)
+        return best
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        signature = tuple(entry["sig"])
+                        namespace = entry["ns"]  # entries without one predate namespaces: skip
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if entry.get("scheme") != SIGNATURE_SCHEME:
+                        continue
+                    if len(signature) == self._bins and entry["key"] not in self.entries:
+                        self._insert(entry["key"], signature, namespace)
+            logging.info(f"📚 Loaded {len(self.entries)} stories into similarity index")
+        except OSError as e:
+            logging.warning(f"⚠️ Could not load story index: {str(e)}")
+
+    def __len__(self):
+        return len(self.entries)
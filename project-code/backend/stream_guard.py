@@ -0,0 +1,107 @@
+import os
+import math
+import logging
+from fastapi import HTTPException
+
+# ✅ Online Validator Settings
+PREAMBLE_MAX_CHARS = int(os.getenv("STREAM_PREAMBLE_MAX_CHARS", "200"))  # text allowed before '{'
+LOOP_WINDOW = 8192            # tail of the output searched for repetition
+LOOP_MIN_CHARS = int(os.getenv("STREAM_LOOP_MIN_CHARS", "4096"))
+LOOP_MIN_REPEATS = 3
+LOOP_CHECK_EVERY = 256        # chars of new output between repetition checks
+# Repetition must persist this much longer before aborting: generated code legitimately
+# repeats (list items, mock data rows), a degenerate loop never stops
+LOOP_CONFIRM_CHARS = int(os.getenv("STREAM_LOOP_CONFIRM_CHARS", "16384"))
+LOOP_PROBE_CHARS = 64         # cheap pre-check before comparing a whole span
+
+# ✅ Option adjustments applied to the retry after an abort
+DEFAULT_REPEAT_PENALTY = 1.1  # Ollama's default
+MAX_REPEAT_PENALTY = 1.5
+RETRY_TEMPERATURE = 0.2
+
+
+class StreamDerailed(HTTPException):
+    """The stream was aborted because it can no longer produce usable output."""
+
+    retryable = True
+
+    def __init__(self, reason: str, detail: str):
+        super().__init__(status_code=500, detail=detail)
+        self.reason = reason
+
+
+def find_loop(text: str):
+    """Return the period of a repetition at the end of ``text``, or None.
+
+    A loop is the same unit repeated at least LOOP_MIN_REPEATS times and
+    covering at least LOOP_MIN_CHARS characters.
+    """
+    # ✅ Candidate periods are earlier occurrences of the last few chars, nearest first
+    probe = text[-LOOP_PROBE_CHARS:]
+    limit = len(text) - 1
+    while True:
+        index = text.rfind(probe, 0, limit)
+        if index == -1:
+            return None
+        limit = index + len(probe) - 1
+        period = len(text) - len(probe) - index
+        if period > len(text) // LOOP_MIN_REPEATS:
+            return None
+        span = period * max(LOOP_MIN_REPEATS, math.ceil(LOOP_MIN_CHARS / period))
+        if span > len(text):
+            continue
+        # ✅ A span has period ``period`` iff it equals itself shifted by one period
+        tail = text[-span:]
+        if tail[period:] == tail[:-period]:
+            return period
+
+
+# ✅ **Online Validators for the Token Stream**
+class StreamGuard:
+    """Watch tokens as they stream and raise StreamDerailed on hopeless output.
+
+    Two failures are detected: more than PREAMBLE_MAX_CHARS of prose before
+    the JSON object opens, and a repetition loop in the most recent output
+    that is still going LOOP_CONFIRM_CHARS later.
+    Raising inside the consuming loop closes the upstream request, so the
+    backend stops generating immediately.
+    """
+
+    def __init__(self):
+        self.tail = ""
+        self.preamble = 0
+        self.chars = 0
+        self._next_loop_check = LOOP_CHECK_EVERY
+        self._loop_since = None   # chars streamed when the current repetition was first seen
+
+    def check(self, token: str, parser):
+        self.chars += len(token)
+        if not parser.started:
+            self.preamble += len(token)
+            if self.preamble > PREAMBLE_MAX_CHARS:
+                raise StreamDerailed("prose", "AI wrote prose instead of JSON.")
+            return
+
+        self.tail = (self.tail + token)[-LOOP_WINDOW:]
+        if self.chars >= self._next_loop_check:
+            self._next_loop_check = self.chars + LOOP_CHECK_EVERY
+            period = find_loop(self.tail)
+            if period is None:
+                self._loop_since = None
+            elif self._loop_since is None:
+                self._loop_since = self.chars
+            elif self.chars - self._loop_since >= LOOP_CONFIRM_CHARS:
+                raise StreamDerailed("loop", f"AI output is looping (period {period} chars).")
+
+
+def adjusted_options(options: dict, reason: str) -> dict:
+    """Options for the retry after an abort for ``reason``."""
+    options = dict(options)
+    if reason == "loop":
+        penalty = options.get("repeat_penalty", DEFAULT_REPEAT_PENALTY)
+        options["repeat_penalty"] = round(min(MAX_REPEAT_PENALTY, penalty + 0.15), 2)
+        options["repeat_last_n"] = max(256, options.get("repeat_last_n", 64))
+    else:
+        options["temperature"] = min(RETRY_TEMPERATURE, options.get("temperature", RETRY_TEMPERATURE))
+    logging.info(f"🎛️ Adjusted options after {reason} abort: {options}")
+    return options
@@ -0,0 +1,225 @@
+import re
+
+# ✅ Characters that end a run of plain string content
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class StreamingParseError(ValueError):
+    """Raised when the token stream can no longer be a valid JSON object."""
+
+
+# ✅ **Incremental Parser for {"files": {path: content}}**
+class StreamingFilesParser:
+    """Push-based JSON parser that emits each "files" entry as soon as it closes.
+
+    Feed it raw model tokens with ``feed()``; it returns the ``(path, content)``
+    pairs completed by that chunk. Text before the first ``{`` (prose, ```json
+    fences) is skipped, and escapes split across chunks are handled. Entries
+    whose value is not a string (an object, array, number or null) are not
+    files; their paths are collected in ``broken``.
+    """
+
+    def __init__(self):
+        self.stack = []          # one frame per open object/array
+        self.started = False
+        self.done = False
+        self.error = None
+        self.files = {}
+        self.broken = []
+
+        self._in_string = False
+        self._string_is_key = False
+        self._buf = []
+        self._escape = None      # None, "\\" or a partial "\\uXXXX"
+        self._surrogates = False
+        self._scalar = False     # inside a number / true / false / null
+
+    # ✅ Public API
+    def feed(self, chunk: str) -> list:
+        """Consume a chunk of model output and return newly completed files."""
+        if self.done or self.error or not chunk:
+            return []
+
+        emitted = []
+        try:
+            self._consume(chunk, emitted)
+        except StreamingParseError as e:
+            self.error = str(e)
+        return emitted
+
+    def close(self):
+        """Signal end of stream; raise if the object never closed."""
+        if self.error:
+            raise StreamingParseError(self.error)
+        if not self.done:
+            raise StreamingParseError("AI response ended before JSON object was closed.")
+
+    # ✅ State machine
+    def _consume(self, chunk: str, emitted: list):
+        i = 0
+        n = len(chunk)
+
+        while i < n:
+            if self.done:
+                return
+
+            if self._in_string:
+                i = self._consume_string(chunk, i, emitted)
+                continue
+
+            ch = chunk[i]
+            i += 1
+
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self.stack.append({"type": "obj", "key": None, "expect": "key"})
+                continue
+
+            if self._scalar:
+                if ch not in ",}] \t\r\n":
+                    continue
+                self._scalar = False
+                self._value_done()
+
+            if ch in " \t\r\n":
+                continue
+
+            frame = self.stack[-1]
+            expect = frame["expect"]
+
+            if expect == "colon":
+                if ch != ":":
+                    raise StreamingParseError(f"Expected ':' but got {ch!r}.")
+                frame["expect"] = "value"
+            elif expect == "comma":
+                if ch == ",":
+                    frame["expect"] = "key" if frame["type"] == "obj" else "value"
+                elif ch == ("}" if frame["type"] == "obj" else "]"):
+                    self._close_container()
+                else:
+                    raise StreamingParseError(f"Expected ',' but got {ch!r}.")
+            elif expect == "key":
+                if ch == '"':
+                    self._start_string(is_key=True)
+                elif ch == "}" and frame.get("empty", True):
+                    self._close_container()
+                else:
+                    raise StreamingParseError(f"Expected object key but got {ch!r}.")
+            else:  # expect == "value"
+                if ch != '"' and self._is_file_entry():
+                    self.broken.append(frame["key"])
+                if ch == '"':
+                    self._start_string(is_key=False)
+                elif ch == "{":
+                    self.stack.append({"type": "obj", "key": None, "expect": "key"})
+                elif ch == "[":
+                    self.stack.append({"type": "arr", "key": None, "expect": "value"})
+                elif ch == "]" and frame["type"] == "arr" and frame.get("empty", True):
+                    self._close_container()
+                elif ch in "-0123456789tfn":
+                    self._scalar = True
+                else:
+                    raise StreamingParseError(f"Unexpected character {ch!r}.")
+
+    def _consume_string(self, chunk: str, i: int, emitted: list) -> int:
+        n = len(chunk)
+
+        while i < n:
+            if self._escape is not None:
+                ch = chunk[i]
+                i += 1
+                if self._escape == "\\":
+                    if ch == "u":
+                        self._escape = ""
+                    elif ch in _ESCAPES:
+                        self._buf.append(_ESCAPES[ch])
+                        self._escape = None
+                    else:
+                        raise StreamingParseError(f"Invalid escape '\\{ch}'.")
+                else:
+                    self._escape += ch
+                    if len(self._escape) == 4:
+                        try:
+                            code = int(self._escape, 16)
+                        except ValueError:
+                            raise StreamingParseError(f"Invalid unicode escape '\\u{self._escape}'.")
+                        if 0xD800 <= code <= 0xDFFF:
+                            self._surrogates = True
+                        self._buf.append(chr(code))
+                        self._escape = None
+                continue
+
+            match = _STRING_SPECIAL.search(chunk, i)
+            if not match:
+                self._buf.append(chunk[i:])
+                return n
+
+            j = match.start()
+            if j > i:
+                self._buf.append(chunk[i:j])
+            i = j + 1
+
+            if chunk[j] == "\\":
+                self._escape = "\\"
+            else:
+                self._end_string(emitted)
+                return i
+
+        return i
+
+    def _start_string(self, is_key: bool):
+        self._in_string = True
+        self._string_is_key = is_key
+        self._buf = []
+        self._surrogates = False
+
+    def _end_string(self, emitted: list):
+        text = "".join(self._buf)
+        if self._surrogates:
+            # ✅ Recombine \\uD83D\\uDD11-style pairs into one code point
+            text = text.encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+        self._in_string = False
+        self._buf = []
+
+        frame = self.stack[-1]
+        frame["empty"] = False
+        if self._string_is_key:
+            frame["key"] = text
+            frame["expect"] = "colon"
+            return
+
+        if self._is_file_entry():
+            self.files[frame["key"]] = text
+            emitted.append((frame["key"], text))
+        self._value_done()
+
+    def _is_file_entry(self) -> bool:
+        return (
+            len(self.stack) == 2
+            and self.stack[0]["key"] == "files"
+            and self.stack[1]["type"] == "obj"
+        )
+
+    def _value_done(self):
+        frame = self.stack[-1]
+        frame["empty"] = False
+        frame["expect"] = "comma"
+
+    def _close_container(self):
+        self.stack.pop()
+        if not self.stack:
+            self.done = True
+            return
+        self._value_done()
@@ -173,8 +173,29 @@ function startReactApp() {
     });
 }
 
-// ✅ Generate AI Code & Save Files
-ipcMain.handle("generate-code", async (event, userStory) => {
+// ✅ Parse Server-Sent Events from a streaming response body
+async function* readServerSentEvents(body) {
+    let buffer = "";
+    for await (const chunk of body) {
+        buffer += chunk.toString("utf-8");
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const message = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const data = message
+                .split("\n")
+                .filter(line => line.startsWith("data:"))
+                .map(line => line.slice(5).trim())
+                .join("\n");
+            if (data) {
+                yield JSON.parse(data);
+            }
+        }
+    }
+}
+
+// ✅ Generate AI Code & Save Files (progress relayed to renderer)
+ipcMain.handle("generate-code", async (event, userStory, options = {}) => {
     try {
         if (!userStory || userStory.trim() === "") {
             throw new Error("User story cannot be empty.");
@@ -182,19 +203,30 @@ ipcMain.handle("generate-code", async (event, userStory) => {
 
         console.log("🔹 Sending request to AI model for:", userStory);
 
-        const response = await fetch(`${BACKEND_URL}/generate-code/`, {
+        const response = await fetch(`${BACKEND_URL}/generate-code/stream`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ text: userStory }),
+            headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+            body: JSON.stringify({ text: userStory, regenerate: Boolean(options.regenerate) }),
         });
 
-        const data = await response.json();
-        if (response.ok) {
-            console.log("✅ Code generation successful!");
-            return { success: true, message: "✅ Code generated successfully!" };
-        } else {
+        if (!response.ok) {
+            const data = await response.json();
             throw new Error(data.detail || "Failed to generate code.");
         }
+
+        for await (const progress of readServerSentEvents(response.body)) {
+            event.sender.send("generation-progress", progress);
+
+            if (progress.event === "done") {
+                console.log("✅ Code generation successful!");
+                return { success: true, message: "✅ Code generated successfully!", files: progress.files };
+            }
+            if (progress.event === "error") {
+                throw new Error(progress.detail || "Failed to generate code.");
+            }
+        }
+
+        throw new Error("Backend closed the progress stream unexpectedly.");
     } catch (error) {
         console.error("❌ Error during code generation:", error.message);
         return { error: `❌ AI request failed: ${error.message}` };
@@ -13,6 +13,30 @@ document.addEventListener("DOMContentLoaded", () => {
         return;
     }
 
+    const codeOutput = document.getElementById('code-output');
+    let writtenFiles = [];
+
+    // Show live progress relayed from the backend
+    ipcRenderer.on('generation-progress', (event, progress) => {
+        switch (progress.event) {
+            case 'stage':
+                progressBar.innerText = `⏳ ${progress.stage}...`;
+                if (progress.stage === 'generating') {
+                    writtenFiles = [];
+                }
+                break;
+            case 'tokens':
+                progressBar.innerText = `⏳ Generating... ${progress.token_count} tokens (${progress.tokens_per_sec} tok/s)`;
+                break;
+            case 'file_written':
+                writtenFiles.push(`📄 ${progress.path} (${progress.size} chars)`);
+                if (codeOutput) {
+                    codeOutput.innerText = writtenFiles.join('\n');
+                }
+                break;
+        }
+    });
+
     // Handle "Generate Code" Button Click
     generateBtn.addEventListener('click', async () => {
         const userStory = document.getElementById('user-story').value;
@@ -60,7 +84,7 @@ document.addEventListener("DOMContentLoaded", () => {
         vscodeBtn.disabled = true;
 
         try {
-            const response = await ipcRenderer.invoke('generate-code', userStory);
+            const response = await ipcRenderer.invoke('generate-code', userStory, { regenerate: true });
             if (response.error) {
                 throw new Error(response.error);
             }